@@ -1,83 +1,84 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import os
-import json
+from io import BytesIO
+from downsampling import downsample
+from engagement_metrics import star_rating
+from prediction_index import WINDOW_COLUMNS, PredictionIndex
 
-# Function to load JSON data
-def load_json_data(file_path):
-    with open(file_path, 'r') as file:
-        data = json.load(file)
-    return pd.DataFrame(data)
+# The dashboard rates the median saved star rating slightly more generously
+DASHBOARD_STAR_THRESHOLDS = (0.85, 0.7, 0.5, 0.3)
+PREDICTIONS_DIR = "saved_predictions"
+PREDICTION_INDEX_PATH = "prediction_index.sqlite3"  # Summaries and per-window rows of the saved prediction files
+MAX_PLOT_POINTS = 1000  # Longer series are reduced to per-bucket minima and maxima before plotting
+
+# Open the index once per process; each rerun only re-ingests changed files
+@st.cache_resource
+def load_prediction_index():
+    return PredictionIndex(PREDICTION_INDEX_PATH, PREDICTIONS_DIR)
+
+# Function to load the per-window rows of one event; cached until the index changes
+@st.cache_data(max_entries=64)
+def load_event_data(_index, event, version):
+    return pd.DataFrame(_index.windows(event), columns=list(WINDOW_COLUMNS))
+
+# Render a time series once per distinct data and release the figure right away
+@st.cache_data(max_entries=64)
+def time_series_png(times, values, ylabel, color=None):
+    times, values = downsample(times, values, MAX_PLOT_POINTS, method="minmax")
+    fig, ax = plt.subplots()
+    try:
+        ax.plot(times, values, marker='o', color=color)
+        ax.set_xlabel("Time Taken")
+        ax.set_ylabel(ylabel)
+        buffer = BytesIO()
+        fig.savefig(buffer, format="png", bbox_inches="tight")
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
 
 # Function to display star rating
 def display_star_rating(rating):
-    full_stars = rating
-    count_rating = 0 
-    if full_stars >=0.85:
-        count_rating = 5
-    elif full_stars >=0.7:
-        count_rating = 4
-    elif full_stars >=0.5:
-        count_rating = 3
-    elif full_stars>=0.3:
-        count_rating = 2 
-    else:
-        count_rating = 1
-    #half_star = 1 if rating - full_stars >= 0.5 else 0
-    #empty_stars = 5 - full_stars - half_star
-    stars = '⭐' * count_rating
-    return stars
+    return star_rating(rating, thresholds=DASHBOARD_STAR_THRESHOLDS)
 
 # Streamlit app
 def main():
     st.title("Crowd Engagement Analysis Dashboard")
 
-    # Get list of JSON files in the directory
-    json_files = [f for f in os.listdir('saved_predictions') if f.endswith('.json')]
+    index = load_prediction_index()
+    index.refresh()
+    summaries = {event['name']: event for event in index.events()}
 
     # Dropdown to select a file
-    selected_file = st.selectbox("Select an event file", json_files)
+    selected_file = st.selectbox("Select an event file", list(summaries))
 
     if selected_file:
-        file_path = os.path.join('saved_predictions', selected_file)
-        df = load_json_data(file_path)
+        summary = summaries[selected_file]
+        df = load_event_data(index, selected_file, index.version())
 
         # Display star rating
-        avg_star_rating = df['star_rating'].median()
+        avg_star_rating = summary['median_star_rating']
         st.subheader("Average Star Rating")
         st.write(display_star_rating(avg_star_rating))
 
         # Display basic statistics
         st.subheader("Basic Statistics")
-        st.write(f"Total Video Frame Capture: {len(df)}")
-        st.write(f"Average Engagement Score: {(df['engagement_score'].mean())*100+40:.2f}")
-        st.write(f"Average Crowd Density: {(df['crowd_density'].mean())*100+40:.2f}")
-        st.write(f"Average Movement: {(df['average_movement'].mean())*100+40:.2f}")
+        st.write(f"Total Video Frame Capture: {summary['windows']}")
+        st.write(f"Average Engagement Score: {summary['mean_engagement_score']*100+40:.2f}")
+        st.write(f"Average Crowd Density: {summary['mean_crowd_density']*100+40:.2f}")
+        st.write(f"Average Movement: {summary['mean_average_movement']*100+40:.2f}")
 
         # Plot engagement score over time
         st.subheader("Engagement Score Over Time")
-        fig, ax = plt.subplots()
-        ax.plot(df['time_taken'], df['engagement_score'], marker='o')
-        ax.set_xlabel("Time Taken")
-        ax.set_ylabel("Engagement Score")
-        st.pyplot(fig)
+        st.image(time_series_png(df['time_taken'].to_numpy(), df['engagement_score'].to_numpy(), "Engagement Score"))
 
         # Plot crowd density over time
         st.subheader("Crowd Density Over Time")
-        fig, ax = plt.subplots()
-        ax.plot(df['time_taken'], df['crowd_density'], marker='o', color='orange')
-        ax.set_xlabel("Time Taken")
-        ax.set_ylabel("Crowd Density")
-        st.pyplot(fig)
+        st.image(time_series_png(df['time_taken'].to_numpy(), df['crowd_density'].to_numpy(), "Crowd Density", 'orange'))
 
         # Plot average movement over time
         st.subheader("Average Movement Over Time")
-        fig, ax = plt.subplots()
-        ax.plot(df['time_taken'], df['average_movement'], marker='o', color='green')
-        ax.set_xlabel("Time Taken")
-        ax.set_ylabel("Average Movement")
-        st.pyplot(fig)
+        st.image(time_series_png(df['time_taken'].to_numpy(), df['average_movement'].to_numpy(), "Average Movement", 'green'))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
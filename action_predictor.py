@@ -1,52 +1,206 @@
+import os
+import threading
+import time
 import cv2
 import numpy as np
 import tensorflow as tf
 import joblib
-from typing import List, Dict
+from typing import List, Dict, Optional, Sequence
+from inference_backends import create_backend, resolve_model_variant
+
+FINGERPRINT_FRAMES = 4  # Frames of a clip compared when looking for an unchanged scene
+FINGERPRINT_SIZE = (16, 16)  # Greyscale thumbnail size of each compared frame
+
+
+def normalize_frames(frames: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """Scale uint8 frames to float32 in [0, 1] in a single pass, without a float64 intermediate."""
+    if out is None:
+        out = np.empty(frames.shape, dtype=np.float32)
+    return np.divide(frames, np.float32(255.0), out=out)
+
+
+def clip_fingerprint(clip: np.ndarray) -> np.ndarray:
+    """Cheap perceptual fingerprint of a uint8 RGB clip: a few evenly spaced frames as small grey thumbnails."""
+    step = max(1, len(clip) // FINGERPRINT_FRAMES)
+    thumbnails = [
+        cv2.resize(cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY), FINGERPRINT_SIZE, interpolation=cv2.INTER_AREA)
+        for frame in clip[::step][:FINGERPRINT_FRAMES]
+    ]
+    return np.stack(thumbnails).astype(np.float32) / 255
+
+
+def fingerprint_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean absolute pixel change between two fingerprints, in [0, 1]."""
+    return float(np.abs(a - b).mean())
+
+
+class WindowReuse:
+    """Window reuse state of one analysis: the last computed window and its prediction.
+
+    Each analysis needs its own, so a new video never starts from the
+    prediction of another one.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.reference = None  # (fingerprint, actions, probabilities) of the last computed window
+        self.hits = 0
+        self.misses = 0
 
 
 class ActionPredictor:
-    def __init__(self, i3d_model_path: str, label_map_path: str):
-        self.i3d_model = self._load_i3d_model(i3d_model_path)
+    def __init__(self, i3d_model_path: str, label_map_path: str, batch_size: int = 1, top_k: int = 5,
+                 model_tags: Optional[Sequence[str]] = None, warmup_batch_size: int = 1,
+                 warmup_shape=(32, 224, 224), backend: str = "tf", num_threads: Optional[int] = None,
+                 model_variant: str = "fp32", reuse_threshold: Optional[float] = None):
+        # Quantized variants are TFLite files written next to the SavedModel by quantize_i3d.py
+        backend, i3d_model_path = resolve_model_variant(i3d_model_path, model_variant, backend)
+        start = time.perf_counter()
+        self.backend = create_backend(backend, i3d_model_path, top_k, model_tags, num_threads)
+        load_seconds = time.perf_counter() - start
         self.labels = self._load_labels(label_map_path)
+        self.batch_size = max(1, int(batch_size))
+        self.top_k = top_k
+        # Identifies the weights and output format, e.g. for keying cached analyses
+        self.model_id = f"{model_variant}:{backend}:{os.path.abspath(i3d_model_path)}:top{top_k}"
+        # Windows whose fingerprint moved less than this reuse the last computed prediction; None disables reuse
+        self.reuse_threshold = reuse_threshold
+        self.window_cache_stats = {'hits': 0, 'misses': 0}  # Totals over all analyses
+        self._stats_lock = threading.Lock()
+        warmup_seconds = self._warm_up(warmup_batch_size, warmup_shape)
+        self.load_stats = {
+            'backend': backend,
+            'model_variant': model_variant,
+            'model_tags': getattr(self.backend, 'tags', None),
+            'load_seconds': load_seconds,
+            'warmup_seconds': warmup_seconds,
+        }
+        print(f"I3D model ready ({model_variant}, {backend} backend): load {load_seconds:.2f}s, warm-up {warmup_seconds:.2f}s")
 
-    def _load_i3d_model(self, model_dir: str) -> tf.keras.Model:
-        """Load I3D model with proper configuration."""
-        return tf.compat.v1.saved_model.load_v2(model_dir, tags=['train'])
+    def _warm_up(self, batch_size: int, shape) -> float:
+        """Run a dummy batch so the first real prediction does not pay for graph tracing."""
+        if batch_size <= 0:
+            return 0.0
+        start = time.perf_counter()
+        frames, height, width = shape
+        self.backend.warm_up(np.zeros((batch_size, frames, height, width, 3), dtype=np.float32))
+        return time.perf_counter() - start
 
     def _load_labels(self, label_file: str) -> List[str]:
         """Load action labels from file."""
         with open(label_file, "r") as f:
             return [line.strip() for line in f.readlines()]
 
+    def resize_i3d_frames(self, frames: List[np.ndarray], frame_size, out: np.ndarray = None) -> np.ndarray:
+        """Resize BGR frames into a preallocated uint8 [frames, height, width, 3] batch."""
+        width, height = frame_size
+        if out is None:
+            out = np.empty((len(frames), height, width, 3), dtype=np.uint8)
+        for i, frame in enumerate(frames):
+            cv2.resize(frame, frame_size, dst=out[i])
+        return out
+
     def preprocess_i3d_frames(self, frames: List[np.ndarray], frame_size) -> tf.Tensor:
         """Preprocess frame sequence for I3D model."""
-        processed_frames = []
-        for frame in frames:
-            frame = cv2.resize(frame, frame_size)
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            processed_frames.append(frame / 255.0)
-        return tf.convert_to_tensor(processed_frames, dtype=tf.float32)
+        resized = self.resize_i3d_frames(frames, frame_size)
+        # BGR -> RGB is a reversed channel view, folded into the float32 normalisation
+        return tf.convert_to_tensor(normalize_frames(resized[..., ::-1]))
 
     def predict_i3d(self, frames: List[np.ndarray], frame_size, max_frames: int) -> Dict[str, float]:
         """Predict action using I3D model."""
-        if len(frames) < max_frames:
-            frames.extend([frames[-1]] * (max_frames - len(frames)))
-        
-        preprocessed = self.preprocess_i3d_frames(frames[:max_frames], frame_size)
-        input_tensor = tf.expand_dims(preprocessed, axis=0)
-        
+        return self.predict_i3d_batch([frames], frame_size, max_frames)[0]
+
+    def predict_i3d_batch(self, windows: List[List[np.ndarray]], frame_size, max_frames: int) -> List[Dict[str, float]]:
+        """Predict actions for several frame windows with a single I3D call."""
+        if not windows:
+            return []
+
+        width, height = frame_size
+        resized = np.empty((len(windows), max_frames, height, width, 3), dtype=np.uint8)
+        for i, frames in enumerate(windows):
+            if len(frames) < max_frames:
+                frames = frames + [frames[-1]] * (max_frames - len(frames))
+            self.resize_i3d_frames(frames[:max_frames], frame_size, out=resized[i])
+        return self._classify(normalize_frames(resized[..., ::-1]))
+
+    def new_window_reuse(self) -> Optional[WindowReuse]:
+        """Fresh reuse state for one analysis, or None if window reuse is disabled."""
+        return WindowReuse(self.reuse_threshold) if self.reuse_threshold is not None else None
+
+    def predict_i3d_clips(self, clips: List[np.ndarray], return_probabilities: bool = False,
+                          window_reuse: Optional[WindowReuse] = None):
+        """Predict actions for already resized uint8 RGB clips of shape [frames, height, width, 3].
+
+        With ``return_probabilities`` the full [clips, labels] probability
+        matrix is returned alongside the top-k dicts. With ``window_reuse``
+        (from ``new_window_reuse``) clips that barely differ from the last
+        computed window of the same analysis reuse its prediction.
+        """
+        if not clips:
+            return ([], None) if return_probabilities else []
+        if window_reuse is not None:
+            return self._predict_reusing(clips, return_probabilities, window_reuse)
+        return self._classify(self._normalize_clips(clips), return_probabilities)
+
+    def _normalize_clips(self, clips: List[np.ndarray]) -> np.ndarray:
+        batch = np.empty((len(clips),) + clips[0].shape, dtype=np.float32)
+        for i, clip in enumerate(clips):
+            normalize_frames(clip, out=batch[i])
+        return batch
+
+    def _predict_reusing(self, clips: List[np.ndarray], return_probabilities: bool, window_reuse: WindowReuse):
+        """Classify only the clips that differ from the last computed window; the rest reuse its prediction."""
+        reference = window_reuse.reference
+        reference_fingerprint = reference[0] if reference else None
+        sources = []  # Per clip: index into ``misses``, or -1 for the reference from an earlier call
+        misses = []
+        source = -1
+        for i, clip in enumerate(clips):
+            fingerprint = clip_fingerprint(clip)
+            if (reference_fingerprint is None or
+                    fingerprint_distance(fingerprint, reference_fingerprint) >= window_reuse.threshold):
+                misses.append(i)
+                reference_fingerprint = fingerprint
+                source = len(misses) - 1
+            sources.append(source)
+
+        results, probabilities = [], None
+        if misses:
+            results, probabilities = self._classify(
+                self._normalize_clips([clips[i] for i in misses]), return_probabilities=True
+            )
+            # A failed prediction is not worth reusing
+            window_reuse.reference = (reference_fingerprint, results[-1], probabilities[-1]) if results[-1] else None
+        window_reuse.misses += len(misses)
+        window_reuse.hits += len(clips) - len(misses)
+        with self._stats_lock:
+            self.window_cache_stats['misses'] += len(misses)
+            self.window_cache_stats['hits'] += len(clips) - len(misses)
+
+        clip_results = [dict(results[i]) if i >= 0 else dict(reference[1]) for i in sources]
+        if not return_probabilities:
+            return clip_results
+        if misses and probabilities is None:
+            return clip_results, None
+        return clip_results, np.stack([probabilities[i] if i >= 0 else reference[2] for i in sources])
+
+    def _classify(self, batch: np.ndarray, return_probabilities: bool = False):
+        """Run the inference backend on a float32 [N, frames, height, width, 3] batch."""
+        batch_size = batch.shape[0]
+        probabilities = None
         try:
-            signature_key = list(self.i3d_model.signatures.keys())[0]
-            predictions = self.i3d_model.signatures[signature_key](input_tensor)
-            logits = predictions['default'].numpy()[0]
-            probabilities = tf.nn.softmax(logits).numpy()
-            
-            top_indices = np.argsort(probabilities)[-5:][::-1]
-            return {
-                self.labels[idx]: float(probabilities[idx])
-                for idx in top_indices
-            }
+            if return_probabilities:
+                probabilities, values, indices = self.backend.probabilities_top_k(batch)
+            else:
+                values, indices = self.backend.top_k(batch)
+            results = [
+                {
+                    self.labels[idx]: float(confidence)
+                    for idx, confidence in zip(clip_indices, clip_values)
+                }
+                for clip_indices, clip_values in zip(indices, values)
+            ]
         except Exception as e:
             print(f"I3D prediction error: {str(e)}")
-            return {}
\ No newline at end of file
+            results = [{} for _ in range(batch_size)]
+        return (results, probabilities) if return_probabilities else results
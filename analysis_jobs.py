@@ -0,0 +1,223 @@
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from video_analysis import analyze_video, video_properties
+
+# Job states; queued and running jobs found at startup were interrupted and are resumed
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_source TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    cache_key TEXT,
+    status TEXT NOT NULL,
+    video_duration REAL,
+    last_time REAL,
+    last_frame INTEGER,
+    windows INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_entries (
+    job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    entry BLOB NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class AnalysisJobs:
+    """Video analyses run as background jobs with a persistent SQLite job table.
+
+    Timeline entries are checkpointed every ``checkpoint_seconds`` together
+    with the last processed frame, so a job interrupted by a crash or
+    restart continues from its checkpoint when the next ``AnalysisJobs`` is
+    created on the same database. Progress is read with ``job()``.
+
+    Entries of a finished job are kept until ``release()``, or until more
+    than ``keep_finished`` newer jobs have finished. Videos under
+    ``video_dir`` are copies made for the jobs and are deleted with the
+    last job that uses them.
+    """
+
+    def __init__(self, db_path: str, action_predictor, workers: int = 1, checkpoint_seconds: float = 5.0,
+                 video_dir: Optional[str] = None, keep_finished: int = 20):
+        self.db_path = db_path
+        self.action_predictor = action_predictor
+        self.checkpoint_seconds = checkpoint_seconds
+        self.video_dir = Path(video_dir).resolve() if video_dir else None
+        self.keep_finished = keep_finished
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="analysis-job")
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+            interrupted = [row['id'] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY id", (QUEUED, RUNNING)
+            )]
+        for job_id in interrupted:
+            self._pool.submit(self._run, job_id)
+        self._prune()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def submit(self, video_source: str, settings: Dict, cache_key: Optional[str] = None) -> int:
+        """Queue an analysis; ``settings`` are the keyword arguments of ``analyze_video``."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            job_id = conn.execute(
+                "INSERT INTO jobs (video_source, settings, cache_key, status, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video_source, json.dumps(settings), cache_key, QUEUED, now, now)
+            ).lastrowid
+        self._pool.submit(self._run, job_id)
+        return job_id
+
+    def cancel(self, job_id: int):
+        with self._lock:
+            self._cancelled.add(job_id)
+        self._update(job_id, status=CANCELLED, only_if_active=True)
+
+    def job(self, job_id: int) -> Optional[Dict]:
+        """The job's row plus ``progress`` in [0, 1]."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['settings'] = json.loads(job['settings'])
+        if job['status'] == DONE:
+            job['progress'] = 1.0
+        elif job['video_duration'] and job['last_time'] is not None:
+            job['progress'] = min(1.0, job['last_time'] / job['video_duration'])
+        else:
+            job['progress'] = 0.0
+        return job
+
+    def jobs(self, limit: int = 20) -> List[Dict]:
+        """Most recent jobs first."""
+        with closing(self._connect()) as conn:
+            ids = [row['id'] for row in conn.execute("SELECT id FROM jobs ORDER BY id DESC LIMIT ?", (limit,))]
+        return [self.job(job_id) for job_id in ids]
+
+    def timeline(self, job_id: int) -> List[Dict]:
+        """Timeline entries checkpointed so far."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT entry FROM job_entries WHERE job_id = ? ORDER BY seq", (job_id,))
+            return [pickle.loads(row['entry']) for row in rows]
+
+    def release(self, job_id: int):
+        """Drop a finished job's checkpointed entries, and its video copy once no other job needs it."""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT video_source, status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row['status'] in (QUEUED, RUNNING):
+                return
+            conn.execute("DELETE FROM job_entries WHERE job_id = ?", (job_id,))
+            in_use = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE video_source = ? AND status IN (?, ?)",
+                (row['video_source'], QUEUED, RUNNING)
+            ).fetchone()[0]
+        video = Path(row['video_source']).resolve()
+        if not in_use and self.video_dir is not None and video.parent == self.video_dir:
+            try:
+                video.unlink(missing_ok=True)
+            except OSError as e:
+                print(f"Could not delete job video {video}: {e}")
+
+    def _prune(self):
+        """Release the finished jobs beyond the ``keep_finished`` most recent ones."""
+        with closing(self._connect()) as conn:
+            stale = [row['id'] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status NOT IN (?, ?) ORDER BY id DESC LIMIT -1 OFFSET ?",
+                (QUEUED, RUNNING, self.keep_finished)
+            )]
+        for job_id in stale:
+            self.release(job_id)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _update(self, job_id: int, only_if_active: bool = False, **columns):
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        sql = f"UPDATE jobs SET {assignments}, updated = ? WHERE id = ?"
+        values = [*columns.values(), time.time(), job_id]
+        if only_if_active:
+            sql += " AND status IN (?, ?)"
+            values += [QUEUED, RUNNING]
+        with closing(self._connect()) as conn, conn:
+            conn.execute(sql, values)
+
+    def _checkpoint(self, job_id: int, entries: List[Dict], seq: int, last_frame: int):
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_entries (job_id, seq, entry) VALUES (?, ?, ?)",
+                [(job_id, seq + i, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+                 for i, entry in enumerate(entries)]
+            )
+            conn.execute(
+                "UPDATE jobs SET last_time = ?, last_frame = ?, windows = windows + ?, updated = ? WHERE id = ?",
+                (entries[-1]['time_taken'], last_frame,
+                 sum(1 for entry in entries if entry['i3d_actions']), time.time(), job_id)
+            )
+
+    def _run(self, job_id: int):
+        job = self.job(job_id)
+        if job is None or job['status'] not in (QUEUED, RUNNING):
+            return
+        settings = job['settings']
+        settings['frame_size'] = tuple(settings['frame_size'])
+        if settings.get('adaptive_intervals') is not None:
+            settings['adaptive_intervals'] = tuple(settings['adaptive_intervals'])
+
+        try:
+            fps, total_frames = video_properties(job['video_source'])
+            self._update(job_id, status=RUNNING, video_duration=float(total_frames / fps))
+            with closing(self._connect()) as conn:
+                seq = conn.execute("SELECT COUNT(*) FROM job_entries WHERE job_id = ?", (job_id,)).fetchone()[0]
+            resume_from_frame = None if job['last_frame'] is None else job['last_frame'] + 1
+
+            pending = []
+            last_checkpoint = time.monotonic()
+
+            def on_entry(entry):
+                nonlocal seq, last_checkpoint
+                with self._lock:
+                    if job_id in self._cancelled:
+                        raise JobCancelled()
+                pending.append(entry)
+                if time.monotonic() - last_checkpoint >= self.checkpoint_seconds:
+                    self._checkpoint(job_id, pending, seq, int(round(entry['time_taken'] * fps)))
+                    seq += len(pending)
+                    pending.clear()
+                    last_checkpoint = time.monotonic()
+
+            analyze_video(self.action_predictor, job['video_source'], on_entry=on_entry,
+                          resume_from_frame=resume_from_frame, **settings)
+            if pending:
+                self._checkpoint(job_id, pending, seq, int(round(pending[-1]['time_taken'] * fps)))
+            self._update(job_id, status=DONE, only_if_active=True)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            print(f"Analysis job {job_id} failed: {e}")
+            self._update(job_id, status=FAILED, error=str(e), only_if_active=True)
+        self._prune()
@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from action_predictor import ActionPredictor
+from engagement_metrics import compute_metrics, time_series_records
+from inference_backends import BACKENDS, MODEL_VARIANTS
+from prediction_store import save_probability_store
+from video_analysis import VIDEO_EXTENSIONS, analyze_video
+
+
+def find_videos(inputs: Sequence[str]) -> List[Path]:
+    """Expand files and directories (not recursively) into a sorted, de-duplicated list of videos."""
+    videos = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            videos.update(child for child in path.iterdir() if child.suffix.lower() in VIDEO_EXTENSIONS)
+        elif path.is_file():
+            videos.add(path)
+        else:
+            print(f"Skipping missing input: {item}")
+    return sorted(videos)
+
+
+def output_path(video: Path, output_dir: Path) -> Path:
+    """Prediction file for a video, named the way the Streamlit page names saved projects."""
+    return output_dir / f"{video.stem.replace(' ', '_').lower()}.json"
+
+
+def analyze_one(action_predictor: ActionPredictor, video: Path, output_dir: Path, settings: Dict) -> Dict:
+    """Analyse one video, write its prediction file and return its throughput figures."""
+    start = time.perf_counter()
+    timeline, duration = analyze_video(
+        action_predictor, str(video), settings['frame_size'], settings['max_frames'],
+        settings['prediction_interval'], sample_fps=settings['sample_fps'],
+        warmup_frames=settings['warmup_frames'], preprocess_workers=settings['preprocess_workers'],
+        keep_probabilities=settings['keep_probabilities']
+    )
+    metrics = compute_metrics(timeline, action_predictor.labels)
+    path = output_path(video, output_dir)
+    with open(path, "w") as f:
+        json.dump(time_series_records(metrics), f, indent=4)
+    if settings['keep_probabilities']:
+        save_probability_store(path, timeline, action_predictor.labels)
+
+    seconds = time.perf_counter() - start
+    windows = len(metrics['time_taken'])
+    return {
+        'video': str(video),
+        'output': str(path),
+        'video_seconds': duration,
+        'windows': windows,
+        'wall_seconds': seconds,
+        'realtime_factor': duration / seconds if seconds else 0.0,
+        'windows_per_second': windows / seconds if seconds else 0.0,
+        'star_rating': metrics['star_rating'],
+    }
+
+
+def run_batch(videos: Sequence[Path], action_predictor: ActionPredictor, output_dir: Path,
+              settings: Dict, workers: int = 1, skip_existing: bool = False) -> List[Dict]:
+    """Analyse videos concurrently with one shared predictor; failures are reported, not raised."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if skip_existing:
+        videos = [video for video in videos if not output_path(video, output_dir).exists()]
+
+    report = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(analyze_one, action_predictor, video, output_dir, settings): video
+                   for video in videos}
+        for future in as_completed(futures):
+            video = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                print(f"{video}: failed: {e}")
+                report.append({'video': str(video), 'error': str(e)})
+                continue
+            print(
+                f"{video}: {row['windows']} windows, {row['video_seconds']:.0f}s of video in "
+                f"{row['wall_seconds']:.1f}s ({row['realtime_factor']:.1f}x real time) {row['star_rating']}"
+            )
+            report.append(row)
+    return report
+
+
+def print_summary(report: List[Dict], wall_seconds: float):
+    done = [row for row in report if 'error' not in row]
+    video_seconds = sum(row['video_seconds'] for row in done)
+    windows = sum(row['windows'] for row in done)
+    print(
+        f"{len(done)}/{len(report)} videos, {video_seconds:.0f}s of video and {windows} windows in "
+        f"{wall_seconds:.1f}s ({video_seconds / wall_seconds if wall_seconds else 0:.1f}x real time, "
+        f"{windows / wall_seconds if wall_seconds else 0:.1f} windows/s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse videos without the Streamlit app.")
+    parser.add_argument("inputs", nargs="+", help="Video files and/or directories of videos")
+    parser.add_argument("--output-dir", default="saved_predictions")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Videos analysed concurrently with the shared model")
+    parser.add_argument("--skip-existing", action="store_true", help="Skip videos that already have a prediction file")
+    parser.add_argument("--model", default="../model/i3d/")
+    parser.add_argument("--label-map", default="../model/i3d/label_map.txt")
+    parser.add_argument("--backend", choices=BACKENDS, default="tf")
+    parser.add_argument("--variant", choices=MODEL_VARIANTS, default="fp32")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--frame-size", type=int, nargs=2, default=(224, 224), metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--max-frames", type=int, default=32)
+    parser.add_argument("--prediction-interval", type=float, default=1.0)
+    parser.add_argument("--sample-fps", type=float)
+    parser.add_argument("--warmup-frames", type=int, default=10)
+    parser.add_argument("--preprocess-workers", type=int, default=2)
+    parser.add_argument("--probabilities", action="store_true", help="Also save full probability vectors as .npz")
+    parser.add_argument("--report", help="Also write the per-video throughput report as JSON")
+    args = parser.parse_args()
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        raise SystemExit("No videos found.")
+
+    frame_size = tuple(args.frame_size)
+    action_predictor = ActionPredictor(
+        args.model, args.label_map, batch_size=args.batch_size, top_k=args.top_k,
+        warmup_shape=(args.max_frames, frame_size[1], frame_size[0]),
+        backend=args.backend, model_variant=args.variant
+    )
+    settings = {
+        'frame_size': frame_size,
+        'max_frames': args.max_frames,
+        'prediction_interval': args.prediction_interval,
+        'sample_fps': args.sample_fps,
+        'warmup_frames': args.warmup_frames,
+        'preprocess_workers': args.preprocess_workers,
+        'keep_probabilities': args.probabilities,
+    }
+
+    start = time.perf_counter()
+    report = run_batch(videos, action_predictor, Path(args.output_dir), settings, args.workers, args.skip_existing)
+    print_summary(report, time.perf_counter() - start)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=4)
+    raise SystemExit(1 if any('error' in row for row in report) else 0)
+
+
+if __name__ == "__main__":
+    main()
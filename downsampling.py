@@ -0,0 +1,82 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point spanning the largest triangle with its neighbours,
+    which preserves peaks and troughs. NaN values count as zero.
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64), nan=0.0)
+
+    # Bucket boundaries over the points between the first and the last one
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        next_start, next_end = edges[bucket + 1], edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_end = max(next_end, next_start + 1)
+        # Average of the next bucket is the third vertex
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous]) -
+            (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(y: np.ndarray, max_points: int) -> np.ndarray:
+    """Indices of each bucket's minimum and maximum, in time order."""
+    n = len(y)
+    if max_points >= n or max_points < 2:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(0, n, max_points // 2 + 1).astype(np.int64)
+    indices = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end <= start:
+            continue
+        bucket = y[start:end]
+        indices.extend(sorted({start + int(np.nanargmin(bucket)), start + int(np.nanargmax(bucket))})
+                       if not np.isnan(bucket).all() else [start])
+    return np.asarray(indices, dtype=np.int64)
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, max_points: int,
+                       x_range: Optional[Tuple[float, float]] = None, method: str = "lttb") -> np.ndarray:
+    """Indices of at most ``max_points`` points of a series, optionally cropped to ``x_range`` first.
+
+    Cropping first gives full resolution when zoomed into a short range.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    crop = np.arange(len(x))
+    if x_range is not None:
+        crop = np.flatnonzero((x >= x_range[0]) & (x <= x_range[1]))
+    if method == "lttb":
+        indices = lttb_indices(x[crop], y[crop], max_points)
+    elif method == "minmax":
+        indices = minmax_indices(y[crop], max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}. Expected 'lttb' or 'minmax'.")
+    return crop[indices]
+
+
+def downsample(x: np.ndarray, y: np.ndarray, max_points: int, x_range: Optional[Tuple[float, float]] = None,
+               method: str = "lttb") -> Tuple[np.ndarray, np.ndarray]:
+    """Cap a series at ``max_points`` points; see ``downsample_indices``."""
+    indices = downsample_indices(x, y, max_points, x_range, method)
+    return np.asarray(x)[indices], np.asarray(y)[indices]
@@ -0,0 +1,226 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Define high-engagement and movement-related actions
+HIGH_ENGAGEMENT_ACTIONS = ["celebrating", "cheerleading", "dancing", "robot dancing", "high kick", "zumba", "singing", "jumping"]
+MOVEMENT_ACTIONS = ["celebrating", "cheerleading", "dancing", "robot dancing", "high kick", "zumba", "marching", "jumping"]
+
+# Weights of engagement, crowd density and average movement in the overall score
+SCORE_WEIGHTS = (0.5, 0.3, 0.2)
+# Minimum overall score for 5, 4, 3 and 2 stars; anything lower gets 1 star
+STAR_THRESHOLDS = (0.9, 0.7, 0.5, 0.3)
+
+
+def engagement_score(actions: Dict[str, float]) -> float:
+    """Summed confidence of the high-engagement actions in one prediction."""
+    return sum(confidence for action, confidence in actions.items() if action in HIGH_ENGAGEMENT_ACTIONS)
+
+
+def window_metrics(actions: Dict[str, float]) -> Dict[str, float]:
+    """Metrics of a single non-empty prediction, with the same definitions as ``compute_metrics``."""
+    total_confidence = sum(actions.values())
+    movement_confidences = [
+        confidence for action, confidence in actions.items()
+        if action in MOVEMENT_ACTIONS
+    ]
+    crowd_density = total_confidence / len(actions)
+    return {
+        'engagement': engagement_score(actions),
+        'crowd_density': crowd_density,
+        'movement': sum(movement_confidences) / len(movement_confidences) if movement_confidences else 0.0,
+        'engagement_score': total_confidence,
+        'average_movement': crowd_density,
+    }
+
+
+def overall_score(engagement: float, crowd_density: float, average_movement: float) -> float:
+    """Weighted overall score, scaled to the range used by the star rating."""
+    weighted = (
+        SCORE_WEIGHTS[0] * engagement +
+        SCORE_WEIGHTS[1] * crowd_density +
+        SCORE_WEIGHTS[2] * average_movement
+    )
+    return weighted * 4
+
+
+def star_count(score: float, thresholds: Sequence[float] = STAR_THRESHOLDS) -> int:
+    """Map an overall score to 1-5 stars."""
+    for stars, threshold in zip(range(5, 1, -1), thresholds):
+        if score >= threshold:
+            return stars
+    return 1
+
+
+def star_rating(score: float, thresholds: Sequence[float] = STAR_THRESHOLDS) -> str:
+    return "⭐" * star_count(score, thresholds)
+
+
+class TimelineMatrix:
+    """A prediction timeline converted once into dense NumPy arrays.
+
+    ``probabilities`` is a [windows, labels] matrix holding each window's
+    predicted confidences (zero for labels that were not predicted) and
+    ``present`` marks which labels each window actually predicted.
+    ``motion`` is each window's frame-difference level (NaN if it was not
+    measured). Windows without a prediction are dropped.
+    """
+
+    def __init__(self, timeline: List[Dict], labels: Optional[Sequence[str]] = None):
+        self.labels = list(labels or [])
+        index = {label: i for i, label in enumerate(self.labels)}
+        times, motion, rows, cols, values = [], [], [], [], []
+        for entry in timeline:
+            actions = entry['i3d_actions']
+            if not actions:
+                continue
+            row = len(times)
+            times.append(entry['time_taken'])
+            motion.append(entry.get('motion'))
+            for action, confidence in actions.items():
+                if action not in index:
+                    index[action] = len(self.labels)
+                    self.labels.append(action)
+                rows.append(row)
+                cols.append(index[action])
+                values.append(confidence)
+
+        self.times = np.asarray(times, dtype=np.float64)
+        self.motion = np.asarray([np.nan if m is None else m for m in motion], dtype=np.float64)
+        self.probabilities = np.zeros((len(times), len(self.labels)), dtype=np.float32)
+        self.present = np.zeros(self.probabilities.shape, dtype=bool)
+        self.probabilities[rows, cols] = values
+        self.present[rows, cols] = True
+
+    @classmethod
+    def from_probabilities(cls, times: np.ndarray, probabilities: np.ndarray, labels: Sequence[str],
+                           top_k: Optional[int] = None, motion: Optional[np.ndarray] = None) -> 'TimelineMatrix':
+        """Build the matrix from full [windows, labels] probability vectors.
+
+        With ``top_k`` only each window's ``top_k`` most likely labels count
+        as predicted, which reproduces the metrics of the original top-k
+        timeline; without it every label counts.
+        """
+        matrix = cls([], labels)
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        matrix.times = np.asarray(times, dtype=np.float64)
+        matrix.motion = (np.full(len(matrix.times), np.nan) if motion is None
+                         else np.asarray(motion, dtype=np.float64))
+        if top_k is None or top_k >= probabilities.shape[1]:
+            matrix.present = np.ones(probabilities.shape, dtype=bool)
+        else:
+            top = np.argpartition(probabilities, -top_k, axis=1)[:, -top_k:]
+            matrix.present = np.zeros(probabilities.shape, dtype=bool)
+            np.put_along_axis(matrix.present, top, True, axis=1)
+        matrix.probabilities = np.where(matrix.present, probabilities, np.float32(0))
+        return matrix
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def label_mask(self, actions: Sequence[str]) -> np.ndarray:
+        return np.isin(np.asarray(self.labels, dtype=object), list(actions))
+
+
+def _mean(values: np.ndarray) -> float:
+    return float(values.mean()) if len(values) else float('nan')
+
+
+def _nanmean(values: np.ndarray) -> float:
+    measured = values[~np.isnan(values)]
+    return float(measured.mean()) if len(measured) else float('nan')
+
+
+def compute_metrics(timeline, labels: Optional[Sequence[str]] = None,
+                    high_engagement_actions: Sequence[str] = HIGH_ENGAGEMENT_ACTIONS,
+                    movement_actions: Sequence[str] = MOVEMENT_ACTIONS) -> Dict:
+    """Compute per-window and overall engagement metrics for a timeline in one pass.
+
+    ``timeline`` is a list of timeline entries or an already built
+    ``TimelineMatrix``, e.g. one loaded from a probability store to
+    recompute metrics with different action lists. Overall engagement and
+    movement only count the high-engagement and movement actions. The
+    per-window ``engagement_score`` and ``average_movement`` series keep
+    the definitions of the saved prediction files: the summed and the mean
+    confidence of all predicted actions. ``motion`` is the measured
+    frame-difference level of each window.
+    """
+    matrix = timeline if isinstance(timeline, TimelineMatrix) else TimelineMatrix(timeline, labels)
+    probabilities = matrix.probabilities
+    present = matrix.present
+    high_mask = matrix.label_mask(high_engagement_actions)
+    movement_mask = matrix.label_mask(movement_actions)
+
+    predicted = present.sum(axis=1)
+    total_confidence = probabilities.sum(axis=1, dtype=np.float64)
+    crowd_density = np.divide(total_confidence, predicted, out=np.zeros(len(matrix)), where=predicted > 0)
+    engagement = probabilities[:, high_mask].sum(axis=1, dtype=np.float64)
+    movement_count = present[:, movement_mask].sum(axis=1)
+    movement_total = probabilities[:, movement_mask].sum(axis=1, dtype=np.float64)
+    movement = np.divide(movement_total, movement_count, out=np.zeros(len(matrix)), where=movement_count > 0)
+
+    top_index = probabilities.argmax(axis=1) if len(matrix) else np.zeros(0, dtype=int)
+    labels_array = np.asarray(matrix.labels, dtype=object)
+
+    overall_engagement = _mean(engagement)
+    overall_crowd_density = _mean(crowd_density)
+    overall_average_movement = _mean(movement)
+    score = overall_score(overall_engagement, overall_crowd_density, overall_average_movement)
+    return {
+        'time_taken': matrix.times,
+        'top_action': labels_array[top_index],
+        'top_confidence': probabilities[np.arange(len(matrix)), top_index].astype(np.float64),
+        'engagement': engagement,
+        'engagement_score': total_confidence,
+        'crowd_density': crowd_density,
+        'average_movement': crowd_density,
+        'movement': movement,
+        'motion': matrix.motion,
+        'overall_motion': _nanmean(matrix.motion),
+        'overall_engagement': overall_engagement,
+        'overall_crowd_density': overall_crowd_density,
+        'overall_average_movement': overall_average_movement,
+        'overall_score': score,
+        'star_rating': star_rating(score),
+    }
+
+
+def time_series_records(metrics: Dict) -> List[Dict]:
+    """Per-window rows in the format written to ``saved_predictions``; ``motion`` is added where it was measured."""
+    records = []
+    for time_taken, action, confidence, engagement, density, movement, motion in zip(
+        metrics['time_taken'], metrics['top_action'], metrics['top_confidence'],
+        metrics['engagement_score'], metrics['crowd_density'], metrics['average_movement'],
+        metrics['motion']
+    ):
+        record = {
+            'time_taken': float(time_taken),
+            'action': action,
+            'confidence': float(confidence),
+            'engagement_score': float(engagement),
+            'crowd_density': float(density),
+            'average_movement': float(movement),
+            'star_rating': metrics['overall_score']
+        }
+        if not np.isnan(motion):
+            record['motion'] = float(motion)
+        records.append(record)
+    return records
+
+
+def summarize_records(records) -> Dict:
+    """Summary of saved per-window rows (a list of dicts or a DataFrame with the same columns)."""
+    columns = {
+        key: np.asarray([record[key] for record in records], dtype=np.float64)
+        if isinstance(records, list) else records[key].to_numpy(dtype=np.float64)
+        for key in ('time_taken', 'engagement_score', 'crowd_density', 'average_movement', 'star_rating')
+    }
+    windows = len(columns['time_taken'])
+    return {
+        'windows': windows,
+        'duration': float(columns['time_taken'].max()) if windows else 0.0,
+        'median_star_rating': float(np.median(columns['star_rating'])) if windows else float('nan'),
+        'mean_engagement_score': _mean(columns['engagement_score']),
+        'mean_crowd_density': _mean(columns['crowd_density']),
+        'mean_average_movement': _mean(columns['average_movement']),
+    }
@@ -0,0 +1,124 @@
+from collections import deque
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+class FrameSampler:
+    """Decide which decoded frames have to be retrieved for the I3D windows.
+
+    A window holds the last ``max_frames`` sampled frames before a prediction
+    frame, where every ``stride``-th source frame is sampled. Frames that are
+    not sampled, or that fall out of the window before the next prediction,
+    only need ``cap.grab()`` instead of a full ``cap.read()``.
+    """
+
+    def __init__(self, fps: float, max_frames: int, prediction_interval: float,
+                 sample_fps: Optional[float] = None):
+        self.fps = fps
+        self.max_frames = max_frames
+        self.prediction_interval = prediction_interval
+        self.stride = max(1, int(round(fps / sample_fps))) if sample_fps else 1
+        self.window_span = max_frames * self.stride  # Source frames covered by one window
+        self._next_prediction = -1
+
+    def is_prediction_frame(self, frame_index: int) -> bool:
+        """Whether a prediction fires on this frame (once per prediction interval)."""
+        elapsed_time = frame_index / self.fps
+        return elapsed_time % self.prediction_interval < (1 / self.fps)
+
+    def advance(self, frame_index: int, motion: Optional[float] = None):
+        """Called when a prediction fires; the fixed schedule ignores it."""
+
+    def next_prediction_frame(self, frame_index: int) -> int:
+        """Return the first prediction frame at or after ``frame_index``."""
+        if self._next_prediction < frame_index:
+            self._next_prediction = frame_index
+            while not self.is_prediction_frame(self._next_prediction):
+                self._next_prediction += 1
+        return self._next_prediction
+
+    def is_sampled(self, frame_index: int) -> bool:
+        return frame_index % self.stride == 0
+
+    def wants(self, frame_index: int) -> bool:
+        """Whether the frame will land in at least one prediction window."""
+        if not self.is_sampled(frame_index):
+            return False
+        return self.next_prediction_frame(frame_index) - frame_index < self.window_span
+
+
+class AdaptiveFrameSampler(FrameSampler):
+    """A sampler whose prediction interval follows the motion in the video.
+
+    After each prediction the next one is scheduled between
+    ``min_interval`` (motion at or above ``motion_high``) and
+    ``max_interval`` (motion at or below ``motion_low``) seconds later,
+    interpolating linearly in between. The first prediction fires as soon as
+    the first window is full.
+    """
+
+    def __init__(self, fps: float, max_frames: int, prediction_interval: float,
+                 sample_fps: Optional[float] = None, min_interval: float = 0.5,
+                 max_interval: float = 2.0, motion_low: float = 0.01, motion_high: float = 0.05):
+        super().__init__(fps, max_frames, prediction_interval, sample_fps)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.motion_low = motion_low
+        self.motion_high = motion_high
+        self._scheduled = None
+
+    def interval_for(self, motion: Optional[float]) -> float:
+        """Seconds until the next prediction for a window with this motion level."""
+        if motion is None:
+            return min(max(self.prediction_interval, self.min_interval), self.max_interval)
+        span = self.motion_high - self.motion_low
+        busy = min(max((motion - self.motion_low) / span, 0.0), 1.0) if span > 0 else float(motion >= self.motion_high)
+        return self.max_interval - busy * (self.max_interval - self.min_interval)
+
+    def next_prediction_frame(self, frame_index: int) -> int:
+        if self._scheduled is None:
+            self._scheduled = frame_index + self.window_span - 1
+        return max(self._scheduled, frame_index)
+
+    def is_prediction_frame(self, frame_index: int) -> bool:
+        return frame_index == self.next_prediction_frame(frame_index)
+
+    def advance(self, frame_index: int, motion: Optional[float] = None):
+        self._scheduled = frame_index + max(1, int(round(self.interval_for(motion) * self.fps)))
+
+
+class MotionMeter:
+    """Mean absolute frame difference over the frames of the current window.
+
+    Frames are compared as small greyscale thumbnails, so the cost per frame
+    is one tiny resize. Differences of frames ``stride`` source frames apart
+    are divided by the gap, so levels are per source frame, in [0, 1], and
+    comparable across sample rates.
+    """
+
+    def __init__(self, window_frames: int, stride: int = 1, size=(32, 18)):
+        self.stride = stride
+        self.size = size
+        self._differences = deque(maxlen=max(1, window_frames - 1))
+        self._previous = None
+        self._previous_index = None
+
+    def update(self, frame_index: int, frame: np.ndarray):
+        """Add a decoded BGR frame."""
+        thumbnail = cv2.cvtColor(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA),
+                                 cv2.COLOR_BGR2GRAY).astype(np.float32)
+        if self._previous is not None and frame_index - self._previous_index == self.stride:
+            self._differences.append(float(np.abs(thumbnail - self._previous).mean()) / (255 * self.stride))
+        elif self._previous is not None:
+            # A gap in the decoded frames; earlier differences belong to an older window
+            self._differences.clear()
+        self._previous = thumbnail
+        self._previous_index = frame_index
+
+    def level(self) -> Optional[float]:
+        """Motion of the recent frames, or None before two consecutive frames were seen."""
+        if not self._differences:
+            return None
+        return sum(self._differences) / len(self._differences)
@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+
+def prepare_frame(frame: np.ndarray, frame_size) -> np.ndarray:
+    """Resize a BGR frame and convert it to RGB for the I3D window."""
+    return cv2.cvtColor(cv2.resize(frame, frame_size), cv2.COLOR_BGR2RGB)
+
+
+class FrameWindow:
+    """Preallocated ring buffer of resized RGB frames for I3D clip windows.
+
+    Each frame is stored twice, at slot ``i`` and ``i + capacity``, so the
+    latest ``capacity`` frames are always one contiguous slice of the backing
+    array and ``window()`` can return them in time order without copying.
+    """
+
+    def __init__(self, capacity: int, frame_size):
+        self.capacity = capacity
+        self.frame_size = frame_size
+        width, height = frame_size
+        self._frames = np.empty((2 * capacity, height, width, 3), dtype=np.uint8)
+        self._resized = np.empty((height, width, 3), dtype=np.uint8)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def is_full(self) -> bool:
+        return self._count >= self.capacity
+
+    def clear(self):
+        """Forget all stored frames without releasing the buffer."""
+        self._next = 0
+        self._count = 0
+
+    def push(self, frame: np.ndarray):
+        """Resize and convert a BGR frame once and append it to the window."""
+        cv2.resize(frame, self.frame_size, dst=self._resized)
+        slot = self._frames[self._next]
+        cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=slot)
+        self._frames[self._next + self.capacity] = slot
+        self._advance()
+
+    def push_prepared(self, frame: np.ndarray):
+        """Append a frame that was already prepared with ``prepare_frame``."""
+        self._frames[self._next] = frame
+        self._frames[self._next + self.capacity] = frame
+        self._advance()
+
+    def _advance(self):
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def window(self) -> np.ndarray:
+        """Return a [frames, height, width, 3] uint8 view of the window, oldest frame first."""
+        if self._count < self.capacity:
+            return self._frames[:self._count]
+        return self._frames[self._next:self._next + self.capacity]
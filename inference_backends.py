@@ -0,0 +1,336 @@
+import argparse
+import os
+from abc import ABC, abstractmethod
+import threading
+import time
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import tensorflow as tf
+
+# Inference tag sets are tried first; the training graph is only a fallback
+MODEL_TAG_CANDIDATES = ([], ['serve'], ['train'])
+BACKENDS = ("tf", "tflite", "onnx")
+# Variant name -> TFLite file written next to the SavedModel by quantize_i3d.py
+QUANTIZED_VARIANTS = {
+    "int8": "i3d_int8.tflite",
+    "float16": "i3d_float16.tflite",
+}
+MODEL_VARIANTS = ("fp32",) + tuple(QUANTIZED_VARIANTS)
+MODEL_FILE_SUFFIXES = (".tflite", ".onnx")  # Single-file exports, as opposed to a SavedModel directory
+
+_model_cache = {}  # (model dir, tags) -> (model, signature, tags, load seconds)
+_model_cache_lock = threading.Lock()
+
+
+def load_i3d_model(model_dir: str, tags: Optional[Sequence[str]] = None):
+    """Load an I3D SavedModel once per process and resolve its signature.
+
+    Returns ``(model, signature, tags, load_seconds)``. Without explicit tags
+    the candidates in ``MODEL_TAG_CANDIDATES`` are tried in order.
+    """
+    candidates = [list(tags)] if tags is not None else MODEL_TAG_CANDIDATES
+    cache_key = (os.path.abspath(model_dir), None if tags is None else tuple(tags))
+    with _model_cache_lock:
+        if cache_key in _model_cache:
+            return _model_cache[cache_key]
+
+        start = time.perf_counter()
+        error = None
+        for candidate in candidates:
+            try:
+                model = tf.compat.v1.saved_model.load_v2(model_dir, tags=candidate)
+            except (RuntimeError, ValueError) as e:
+                error = e
+                continue
+            signature_key = list(model.signatures.keys())[0]
+            loaded = (model, model.signatures[signature_key], candidate, time.perf_counter() - start)
+            _model_cache[cache_key] = loaded
+            return loaded
+        raise error
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    """Numerically stable softmax over the last axis, in float32."""
+    shifted = logits.astype(np.float32) - logits.max(axis=-1, keepdims=True)
+    np.exp(shifted, out=shifted)
+    shifted /= shifted.sum(axis=-1, keepdims=True)
+    return shifted
+
+
+def top_k(probabilities: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the ``k`` largest values and their indices per row, largest first."""
+    indices = np.argpartition(probabilities, -k, axis=-1)[:, -k:]
+    values = np.take_along_axis(probabilities, indices, axis=-1)
+    order = np.argsort(-values, axis=-1)
+    return np.take_along_axis(values, order, axis=-1), np.take_along_axis(indices, order, axis=-1)
+
+
+class InferenceBackend(ABC):
+    """Runs the I3D model on a float32 [N, frames, height, width, 3] batch."""
+
+    name = None
+
+    def __init__(self, top_k: int = 5):
+        self.k = top_k
+
+    @abstractmethod
+    def logits(self, batch: np.ndarray) -> np.ndarray:
+        """Raw model outputs, [N, labels]."""
+
+    def probabilities(self, batch: np.ndarray) -> np.ndarray:
+        return softmax(self.logits(batch))
+
+    def top_k(self, batch: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return top_k(self.probabilities(batch), self.k)
+
+    def probabilities_top_k(self, batch: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Full probability vectors plus their top-k values and indices, from one model call."""
+        probabilities = self.probabilities(batch)
+        values, indices = top_k(probabilities, self.k)
+        return probabilities, values, indices
+
+    def warm_up(self, batch: np.ndarray):
+        """Run a dummy batch through every path real predictions take."""
+        self.top_k(batch)
+
+
+class TFSavedModelBackend(InferenceBackend):
+    """The SavedModel signature, with softmax and top-k compiled into one graph."""
+
+    name = "tf"
+
+    def __init__(self, model_dir: str, top_k: int = 5, tags: Optional[Sequence[str]] = None):
+        super().__init__(top_k)
+        self.model, self.signature, self.tags, _ = load_i3d_model(model_dir, tags)
+        signature = self.signature
+        k = self.k
+        spec = [tf.TensorSpec([None, None, None, None, 3], tf.float32)]
+
+        @tf.function(input_signature=spec)
+        def predict_logits(input_tensor):
+            return signature(input_tensor)['default']
+
+        @tf.function(input_signature=spec)
+        def predict_top_k(input_tensor):
+            return tf.math.top_k(tf.nn.softmax(signature(input_tensor)['default']), k=k)
+
+        @tf.function(input_signature=spec)
+        def predict_probabilities_top_k(input_tensor):
+            probabilities = tf.nn.softmax(signature(input_tensor)['default'])
+            return probabilities, tf.math.top_k(probabilities, k=k)
+
+        self._predict_logits = predict_logits
+        self._predict_top_k = predict_top_k
+        self._predict_probabilities_top_k = predict_probabilities_top_k
+
+    def logits(self, batch: np.ndarray) -> np.ndarray:
+        return self._predict_logits(tf.convert_to_tensor(batch)).numpy()
+
+    def top_k(self, batch: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        result = self._predict_top_k(tf.convert_to_tensor(batch))
+        return result.values.numpy(), result.indices.numpy()
+
+    def probabilities_top_k(self, batch: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        probabilities, result = self._predict_probabilities_top_k(tf.convert_to_tensor(batch))
+        return probabilities.numpy(), result.values.numpy(), result.indices.numpy()
+
+    def warm_up(self, batch: np.ndarray):
+        # Top-k alone and top-k with probabilities are separately traced graphs
+        self.top_k(batch)
+        self.probabilities_top_k(batch)
+
+
+class TFLiteBackend(InferenceBackend):
+    """A converted ``.tflite`` model, run with tflite_runtime when installed.
+
+    Batch sizes vary (partial flushes, window reuse), and resizing an
+    interpreter reallocates all its tensors, so one interpreter is kept per
+    input shape. The model file is memory-mapped, so they share the weights.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path: str, top_k: int = 5, num_threads: Optional[int] = None):
+        super().__init__(top_k)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            Interpreter = tf.lite.Interpreter
+        self._create_interpreter = lambda: Interpreter(model_path=model_path, num_threads=num_threads)
+        self._interpreters = {}  # Input shape -> (interpreter, input details, output details)
+        self._lock = threading.Lock()  # Interpreters are not thread-safe
+
+    def _interpreter(self, shape):
+        if shape not in self._interpreters:
+            interpreter = self._create_interpreter()
+            input_details = interpreter.get_input_details()[0]
+            if tuple(input_details['shape']) != shape:
+                interpreter.resize_tensor_input(input_details['index'], shape)
+            interpreter.allocate_tensors()
+            self._interpreters[shape] = (
+                interpreter, interpreter.get_input_details()[0], interpreter.get_output_details()[0]
+            )
+        return self._interpreters[shape]
+
+    def logits(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            interpreter, input_details, output_details = self._interpreter(batch.shape)
+            interpreter.set_tensor(input_details['index'], batch)
+            interpreter.invoke()
+            return interpreter.get_tensor(output_details['index']).copy()
+
+
+class ONNXBackend(InferenceBackend):
+    """An ONNX export of the model, run with ONNX Runtime on the CPU."""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, top_k: int = 5, num_threads: Optional[int] = None):
+        super().__init__(top_k)
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx backend requires the onnxruntime package.") from e
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def logits(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+def create_backend(name: str, model_path: str, top_k: int = 5, tags: Optional[Sequence[str]] = None,
+                   num_threads: Optional[int] = None) -> InferenceBackend:
+    """Create the inference backend selected by ``name`` (one of ``BACKENDS``)."""
+    if name == "tf":
+        return TFSavedModelBackend(model_path, top_k, tags)
+    if name == "tflite":
+        return TFLiteBackend(model_path, top_k, num_threads)
+    if name == "onnx":
+        return ONNXBackend(model_path, top_k, num_threads)
+    raise ValueError(f"Unknown inference backend: {name}. Expected one of {BACKENDS}.")
+
+
+def resolve_model_variant(model_path: str, variant: str, backend: str = "tf") -> Tuple[str, str]:
+    """Return the ``(backend, model path)`` that serves ``variant`` of the model at ``model_path``.
+
+    Quantized variants live in the SavedModel directory; when ``model_path``
+    is a converted ``.tflite``/``.onnx`` file, the directory containing it
+    is used.
+    """
+    if variant == "fp32":
+        return backend, model_path
+    if variant not in QUANTIZED_VARIANTS:
+        raise ValueError(f"Unknown model variant: {variant}. Expected one of {MODEL_VARIANTS}.")
+    model_dir = model_path
+    if os.path.isfile(model_path) or model_path.endswith(MODEL_FILE_SUFFIXES):
+        model_dir = os.path.dirname(model_path)
+    return "tflite", os.path.join(model_dir, QUANTIZED_VARIANTS[variant])
+
+
+def _logits_fn(model_dir: str, tags: Optional[Sequence[str]], input_shape):
+    _, signature, _, _ = load_i3d_model(model_dir, tags)
+    return tf.function(
+        lambda input_tensor: signature(input_tensor)['default'],
+        input_signature=[tf.TensorSpec(input_shape, tf.float32)]
+    )
+
+
+def convert_to_tflite(model_dir: str, output_path: str, tags: Optional[Sequence[str]] = None,
+                      input_shape=(1, 32, 224, 224, 3), configure=None) -> str:
+    """Convert the SavedModel to a ``.tflite`` file; ``configure`` may adjust the converter."""
+    model, _, _, _ = load_i3d_model(model_dir, tags)
+    logits_fn = _logits_fn(model_dir, tags, input_shape)
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([logits_fn.get_concrete_function()], model)
+    if configure is not None:
+        configure(converter)
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+    return output_path
+
+
+def convert_to_onnx(model_dir: str, output_path: str, tags: Optional[Sequence[str]] = None,
+                    input_shape=(None, 32, 224, 224, 3)) -> str:
+    """Export the SavedModel signature to ONNX with tf2onnx."""
+    try:
+        import tf2onnx
+    except ImportError as e:
+        raise ImportError("ONNX export requires the tf2onnx package.") from e
+    logits_fn = _logits_fn(model_dir, tags, input_shape)
+    tf2onnx.convert.from_function(
+        logits_fn, input_signature=[tf.TensorSpec(input_shape, tf.float32, name="input")],
+        output_path=output_path
+    )
+    return output_path
+
+
+def check_parity(reference: InferenceBackend, candidate: InferenceBackend, batch: np.ndarray) -> dict:
+    """Compare a backend's probabilities and top-k labels against the reference backend."""
+    expected = reference.probabilities(batch)
+    actual = candidate.probabilities(batch)
+    k = min(reference.k, candidate.k)
+    _, expected_top = top_k(expected, k)
+    _, actual_top = top_k(actual, k)
+    return {
+        'max_abs_diff': float(np.abs(expected - actual).max()),
+        'top1_agreement': float(np.mean(expected_top[:, 0] == actual_top[:, 0])),
+        'topk_overlap': float(np.mean([
+            len(set(e) & set(a)) / k for e, a in zip(expected_top, actual_top)
+        ])),
+    }
+
+
+def load_parity_batch(video_path: Optional[str], clips: int, frames: int, frame_size) -> np.ndarray:
+    """Build a float32 batch of consecutive clips from a video, or random clips without one."""
+    width, height = frame_size
+    if video_path is None:
+        rng = np.random.default_rng(0)
+        return rng.random((clips, frames, height, width, 3), dtype=np.float32)
+
+    import cv2
+    from action_predictor import normalize_frames
+    from frame_window import prepare_frame
+
+    cap = cv2.VideoCapture(video_path)
+    prepared = []
+    while len(prepared) < clips * frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        prepared.append(prepare_frame(frame, frame_size))
+    cap.release()
+    if len(prepared) < frames:
+        raise ValueError(f"{video_path} is shorter than one {frames}-frame clip.")
+    usable = len(prepared) // frames * frames
+    return normalize_frames(np.stack(prepared[:usable]).reshape(-1, frames, height, width, 3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check TFLite/ONNX backends against the TF SavedModel.")
+    parser.add_argument("--saved-model", default="../model/i3d/", help="Reference SavedModel directory")
+    parser.add_argument("--tflite", help="Converted .tflite model to check")
+    parser.add_argument("--onnx", help="Exported .onnx model to check")
+    parser.add_argument("--video", help="Video to draw clips from (random clips if omitted)")
+    parser.add_argument("--clips", type=int, default=4)
+    parser.add_argument("--tolerance", type=float, default=1e-3, help="Maximum allowed probability difference")
+    args = parser.parse_args()
+
+    batch = load_parity_batch(args.video, args.clips, 32, (224, 224))
+    reference = TFSavedModelBackend(args.saved_model)
+    candidates = [("tflite", args.tflite), ("onnx", args.onnx)]
+    failed = False
+    for name, path in candidates:
+        if not path:
+            continue
+        report = check_parity(reference, create_backend(name, path), batch)
+        ok = report['max_abs_diff'] <= args.tolerance
+        failed |= not ok
+        print(f"{name}: {'OK' if ok else 'MISMATCH'} {report}")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
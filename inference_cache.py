@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+_CHUNK_SIZE = 1 << 20  # Bytes hashed per read
+
+
+def video_digest(source) -> str:
+    """SHA-256 of a video's bytes; ``source`` is a file path or the raw bytes."""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+        return digest.hexdigest()
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def url_validator(url: str, timeout: float = 5.0) -> Optional[str]:
+    """The ETag or Last-Modified header of a URL, which changes with its content; None if there is neither."""
+    try:
+        with urlopen(Request(url, method="HEAD"), timeout=timeout) as response:
+            return response.headers.get('ETag') or response.headers.get('Last-Modified')
+    except (URLError, OSError, ValueError):
+        return None
+
+
+def cache_key(video_hash: str, model_id: str, settings: Dict) -> str:
+    """Key of one analysis: the video, the model that ran and the sampling parameters."""
+    payload = json.dumps({'video': video_hash, 'model': model_id, 'settings': settings},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class InferenceCache:
+    """Analysis results on disk, one pickle per cache key, evicted least recently used first.
+
+    A file's modification time is its last use; once the directory grows
+    past ``max_bytes`` the oldest files are removed.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 2 ** 20):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pkl"
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Dict]:
+        """The cached value, or None; with ``max_age`` entries whose ``cached_at`` is older count as missing."""
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+            except FileNotFoundError:
+                return None
+            except (OSError, pickle.UnpicklingError, EOFError) as e:
+                print(f"Dropping unreadable cache entry {path}: {e}")
+                path.unlink(missing_ok=True)
+                return None
+            if max_age is not None and time.time() - value.get('cached_at', 0) > max_age:
+                path.unlink(missing_ok=True)
+                return None
+            os.utime(path)  # Mark as recently used
+            return value
+
+    def put(self, key: str, value: Dict):
+        """Store ``value`` under ``key``, stamped with ``cached_at``."""
+        value = {**value, 'cached_at': time.time()}
+        with self._lock:
+            # Write to a temporary file first so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self._path(key))
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for path in self.cache_dir.glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def size_bytes(self) -> int:
+        return sum(path.stat().st_size for path in self.cache_dir.glob("*.pkl"))
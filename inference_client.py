@@ -0,0 +1,58 @@
+import json
+from io import BytesIO
+from typing import Dict, List
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+import numpy as np
+
+
+class RemoteActionPredictor:
+    """Stand-in for ``ActionPredictor`` that classifies clips on an ``inference_server``.
+
+    Only clip prediction is remote; decoding and preprocessing stay in the
+    calling process, so ``InferencePipeline`` works with either predictor.
+    """
+
+    def __init__(self, url: str, batch_size: int = 8, timeout: float = 120.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        with urlopen(f"{self.url}/info", timeout=timeout) as response:
+            info = json.load(response)
+        self.labels = info['labels']
+        self.top_k = info['top_k']
+        self.model_id = info['model_id']
+        self.load_stats = {**info['load_stats'], 'backend': f"remote {info['load_stats']['backend']}"}
+        self.batch_size = max(1, int(batch_size))
+        # Window reuse is a local optimisation; the service always runs the model
+        self.reuse_threshold = None
+        self.window_cache_stats = {'hits': 0, 'misses': 0}
+
+    def new_window_reuse(self):
+        return None
+
+    def predict_i3d_clips(self, clips: List[np.ndarray], return_probabilities: bool = False, window_reuse=None):
+        """Predict actions for uint8 RGB clips of shape [frames, height, width, 3] on the service."""
+        if not clips:
+            return ([], None) if return_probabilities else []
+
+        buffer = BytesIO()
+        np.save(buffer, np.stack(clips).astype(np.uint8, copy=False), allow_pickle=False)
+        query = "?probabilities=1" if return_probabilities else ""
+        request = Request(f"{self.url}/predict_clips{query}", data=buffer.getvalue(),
+                          headers={'Content-Type': 'application/octet-stream'}, method="POST")
+        probabilities = None
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                payload = json.load(response)
+            results = payload['predictions']
+            if return_probabilities and all(row is not None for row in payload['probabilities']):
+                probabilities = np.asarray(payload['probabilities'], dtype=np.float32)
+        except (HTTPError, URLError, OSError, ValueError, KeyError) as e:
+            print(f"I3D service error: {str(e)}")
+            results = [{} for _ in clips]
+        return (results, probabilities) if return_probabilities else results
+
+    def info(self) -> Dict:
+        with urlopen(f"{self.url}/info", timeout=self.timeout) as response:
+            return json.load(response)
@@ -0,0 +1,173 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from frame_sampler import AdaptiveFrameSampler, FrameSampler, MotionMeter
+from frame_window import FrameWindow, prepare_frame
+from stage_queues import DONE, get_until_done, put_until_stopped
+
+
+class InferencePipeline:
+    """Decode, preprocess and classify a video on background threads.
+
+    A decoder thread reads frames from ``cap`` and hands the ones the I3D
+    window needs to a preprocessing pool. An inference worker assembles the
+    prepared frames into clip windows and classifies them in batches. The
+    stages are connected by bounded queues, so a slow model throttles the
+    decoder instead of buffering the whole video. The caller only iterates
+    over ``results()``.
+    """
+
+    def __init__(self, action_predictor, cap, fps: float, frame_size, max_frames: int,
+                 prediction_interval: float, sample_fps: Optional[float] = None,
+                 start_frame: int = 0, end_frame: Optional[int] = None,
+                 emit_from_frame: Optional[int] = None, preprocess_workers: int = 2,
+                 queue_size: int = 64, keep_probabilities: bool = False,
+                 adaptive_intervals: Optional[Tuple[float, float]] = None):
+        self.action_predictor = action_predictor
+        self.cap = cap
+        self.fps = fps
+        self.frame_size = frame_size
+        self.max_frames = max_frames
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        # Frames before this only fill the window; their predictions are not emitted
+        self.emit_from_frame = start_frame if emit_from_frame is None else emit_from_frame
+        if adaptive_intervals is None:
+            self.sampler = FrameSampler(fps, max_frames, prediction_interval, sample_fps)
+        else:
+            # Predict more often during high-motion segments, less often in quiet ones
+            min_interval, max_interval = adaptive_intervals
+            self.sampler = AdaptiveFrameSampler(fps, max_frames, prediction_interval, sample_fps,
+                                                min_interval=min_interval, max_interval=max_interval)
+        self.motion = MotionMeter(max_frames, self.sampler.stride)
+        # Attach each window's full float16 probability vector to its entry
+        self.keep_probabilities = keep_probabilities
+        # Window reuse never crosses from one analysis into another
+        self.window_reuse = action_predictor.new_window_reuse()
+
+        self._frames = queue.Queue(maxsize=queue_size)
+        self._results = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._started = False
+        self._error = None
+        self._pool = ThreadPoolExecutor(max_workers=preprocess_workers)
+        self._decoder = threading.Thread(target=self._decode, name="i3d-decoder", daemon=True)
+        self._worker = threading.Thread(target=self._infer, name="i3d-inference", daemon=True)
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            self._decoder.start()
+            self._worker.start()
+        return self
+
+    def stop(self):
+        """Stop all stages and release the video capture."""
+        self._stop.set()
+        for thread in (self._decoder, self._worker):
+            if thread.is_alive():
+                thread.join()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def results(self) -> Iterator[Dict]:
+        """Yield timeline entries in time order as predictions complete."""
+        self.start()
+        while True:
+            entry = get_until_done(self._results, self._worker, self._stop)
+            if entry is DONE:
+                break
+            yield entry
+        if self._error is not None:
+            raise self._error
+
+    def _decode(self):
+        frame_index = self.start_frame
+        try:
+            while not self._stop.is_set() and self.cap.isOpened():
+                if self.end_frame is not None and frame_index >= self.end_frame:
+                    break
+                if self.sampler.wants(frame_index):
+                    ret, frame = self.cap.read()
+                    if not ret:
+                        break
+                    self.motion.update(frame_index, frame)
+                    future = self._pool.submit(prepare_frame, frame, self.frame_size)
+                    if not put_until_stopped(self._frames, ('frame', future), self._stop):
+                        break
+                elif not self.cap.grab():
+                    break
+
+                if self.sampler.is_prediction_frame(frame_index):
+                    motion = self.motion.level()
+                    self.sampler.advance(frame_index, motion)
+                    if frame_index >= self.emit_from_frame:
+                        item = ('predict', (frame_index / self.fps, motion))
+                        if not put_until_stopped(self._frames, item, self._stop):
+                            break
+                frame_index += 1
+        except Exception as e:
+            self._error = e
+        finally:
+            self.cap.release()
+            put_until_stopped(self._frames, DONE, self._stop)
+
+    def _infer(self):
+        frame_window = FrameWindow(self.max_frames, self.frame_size)
+        batch_size = self.action_predictor.batch_size
+        entries = []  # Entries since the last flush, in time order
+        pending = []  # (timeline entry, clip) pairs waiting for a batched prediction
+        try:
+            while True:
+                item = get_until_done(self._frames, self._decoder, self._stop)
+                if item is DONE:
+                    break
+                kind, payload = item
+                if kind == 'frame':
+                    frame_window.push_prepared(payload.result())
+                    continue
+
+                time_taken, motion = payload
+                entry = {
+                    'time_taken': time_taken,
+                    'i3d_actions': {},
+                    'motion': motion
+                }
+                entries.append(entry)
+                if frame_window.is_full():
+                    clip = frame_window.window()
+                    if batch_size > 1:
+                        # The ring buffer is overwritten before a batch flushes
+                        clip = clip.copy()
+                    pending.append((entry, clip))
+                if len(pending) >= batch_size:
+                    self._flush(entries, pending)
+            self._flush(entries, pending)
+        except Exception as e:
+            self._error = e
+            self._stop.set()
+        finally:
+            put_until_stopped(self._results, DONE, self._stop)
+
+    def _flush(self, entries: List[Dict], pending: List):
+        if pending:
+            clips = [clip for _, clip in pending]
+            if self.keep_probabilities:
+                results, probabilities = self.action_predictor.predict_i3d_clips(
+                    clips, return_probabilities=True, window_reuse=self.window_reuse
+                )
+            else:
+                results = self.action_predictor.predict_i3d_clips(clips, window_reuse=self.window_reuse)
+                probabilities = None
+            for i, ((entry, _), i3d_actions) in enumerate(zip(pending, results)):
+                entry['i3d_actions'] = i3d_actions
+                if probabilities is not None:
+                    entry['probabilities'] = probabilities[i].astype(np.float16)
+        for entry in entries:
+            if not put_until_stopped(self._results, entry, self._stop):
+                break
+        entries.clear()
+        pending.clear()
@@ -0,0 +1,187 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from action_predictor import ActionPredictor
+from inference_backends import BACKENDS, MODEL_VARIANTS
+
+
+class MicroBatcher:
+    """Merge clips from concurrent requests into batched model calls.
+
+    A batch is sent to the model once it holds ``max_batch_size`` clips or
+    ``max_wait`` seconds after its first clip arrived, whichever is first.
+    Only clips of the same shape are batched together.
+    """
+
+    def __init__(self, action_predictor: ActionPredictor, max_batch_size: int = 16, max_wait: float = 0.01):
+        self.action_predictor = action_predictor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.stats = {'batches': 0, 'clips': 0}
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="i3d-micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, clip: np.ndarray) -> Future:
+        """Queue one uint8 [frames, height, width, 3] clip; the future resolves to ``(actions, probabilities)``."""
+        future = Future()
+        self._queue.put((clip, future))
+        return future
+
+    def predict(self, clips: List[np.ndarray]) -> List[Tuple[Dict[str, float], np.ndarray]]:
+        futures = [self.submit(clip) for clip in clips]
+        return [future.result() for future in futures]
+
+    def stop(self):
+        self._stop.set()
+        self._worker.join()
+
+    def _run(self):
+        carry = None  # A clip of another shape that starts the next batch
+        while not self._stop.is_set():
+            if carry is None:
+                try:
+                    carry = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            batch, carry = [carry], None
+            shape = batch[0][0].shape
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item[0].shape != shape:
+                    carry = item
+                    break
+                batch.append(item)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[Tuple[np.ndarray, Future]]):
+        try:
+            results, probabilities = self.action_predictor.predict_i3d_clips(
+                [clip for clip, _ in batch], return_probabilities=True
+            )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.stats['batches'] += 1
+        self.stats['clips'] += len(batch)
+        for i, (_, future) in enumerate(batch):
+            future.set_result((results[i], None if probabilities is None else probabilities[i]))
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """``GET /info`` describes the model; ``POST /predict_clips`` classifies a .npy batch of uint8 clips."""
+
+    server_version = "I3DInference/1.0"
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/info":
+            self._send_json(404, {'error': f"Unknown path: {self.path}"})
+            return
+        batcher = self.server.batcher
+        predictor = batcher.action_predictor
+        self._send_json(200, {
+            'model_id': predictor.model_id,
+            'labels': predictor.labels,
+            'top_k': predictor.top_k,
+            'batch_size': predictor.batch_size,
+            'load_stats': predictor.load_stats,
+            'batching': {**batcher.stats, 'max_batch_size': batcher.max_batch_size, 'max_wait': batcher.max_wait},
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/predict_clips":
+            self._send_json(404, {'error': f"Unknown path: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            clips = np.load(BytesIO(self.rfile.read(length)), allow_pickle=False)
+            if clips.dtype != np.uint8 or clips.ndim != 5 or clips.shape[-1] != 3:
+                raise ValueError(f"Expected uint8 clips of shape [N, frames, height, width, 3], got {clips.dtype} {clips.shape}")
+        except (ValueError, EOFError, OSError) as e:
+            # Malformed, truncated or empty bodies are the client's fault
+            self._send_json(400, {'error': f"Invalid clip batch: {e}"})
+            return
+
+        try:
+            results = self.server.batcher.predict(list(clips))
+        except Exception as e:
+            self._send_json(500, {'error': f"I3D prediction error: {e}"})
+            return
+        response = {'predictions': [actions for actions, _ in results]}
+        if parse_qs(url.query).get('probabilities') == ['1']:
+            response['probabilities'] = [
+                None if probabilities is None else probabilities.astype(np.float16).tolist()
+                for _, probabilities in results
+            ]
+        self._send_json(200, response)
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep the console for startup and error output
+
+
+def create_server(action_predictor: ActionPredictor, host: str = "127.0.0.1", port: int = 8765,
+                  max_batch_size: int = 16, max_wait: float = 0.01) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), InferenceRequestHandler)
+    server.daemon_threads = True
+    server.batcher = MicroBatcher(action_predictor, max_batch_size, max_wait)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve one warm I3D model to the Streamlit pages over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch-size", type=int, default=16, help="Clips merged into one model call")
+    parser.add_argument("--max-wait-ms", type=float, default=10.0, help="Longest a clip waits for its batch to fill")
+    parser.add_argument("--model", default="../model/i3d/")
+    parser.add_argument("--label-map", default="../model/i3d/label_map.txt")
+    parser.add_argument("--backend", choices=BACKENDS, default="tf")
+    parser.add_argument("--variant", choices=MODEL_VARIANTS, default="fp32")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    action_predictor = ActionPredictor(
+        args.model, args.label_map, batch_size=args.max_batch_size, top_k=args.top_k,
+        backend=args.backend, model_variant=args.variant
+    )
+    server = create_server(action_predictor, args.host, args.port, args.max_batch_size, args.max_wait_ms / 1000)
+    print(f"Serving {action_predictor.model_id} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+import argparse
+import queue
+import threading
+import time
+from typing import Dict, Iterator, Optional, Union
+
+import cv2
+import numpy as np
+
+from action_predictor import ActionPredictor
+from frame_sampler import FrameSampler, MotionMeter
+from frame_window import FrameWindow
+from inference_backends import BACKENDS, MODEL_VARIANTS
+from stage_queues import DONE, get_until_done, put_until_stopped
+from streaming_metrics import RunningStat
+
+DROP_POLICIES = ("oldest", "newest")
+DEFAULT_STREAM_FPS = 25.0  # Assumed when a stream does not report its frame rate
+STREAM_TIMEOUT_MS = 5000  # Longest a stream open or read may block, so a stalled stream cannot hold up stop()
+_JOIN_TIMEOUT = 2.0  # Seconds stop() waits for each thread before leaving it to finish on its own
+
+
+def open_stream(source: Union[str, int]) -> cv2.VideoCapture:
+    """Open a webcam index (e.g. ``"0"``), an RTSP/HTTP stream URL or a video file."""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    # Timeouts have to be given when opening; backends that do not support them ignore them
+    cap = cv2.VideoCapture(source, cv2.CAP_ANY, [
+        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, STREAM_TIMEOUT_MS,
+        cv2.CAP_PROP_READ_TIMEOUT_MSEC, STREAM_TIMEOUT_MS,
+    ])
+    if not cap.isOpened():
+        raise IOError(f"Could not open stream: {source}")
+    # Keep as few frames as possible buffered inside the capture backend
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class LiveStats:
+    """Frame, drop and latency counters of a live analysis."""
+
+    def __init__(self):
+        self.frames = 0
+        self.windows = 0  # Windows handed to the inference queue
+        self.predictions = 0
+        self.dropped_full = 0  # Windows dropped because the queue was full
+        self.dropped_stale = 0  # Windows dropped because they could no longer meet the latency bound
+        self.latency = RunningStat()  # Seconds from capturing a window's last frame to its prediction
+        self.queue_depth = RunningStat()  # Queued windows, sampled whenever a window is queued
+        self.inference_seconds = RunningStat()  # Seconds per model call
+
+    def summary(self) -> Dict:
+        return {
+            'frames': self.frames,
+            'windows': self.windows,
+            'predictions': self.predictions,
+            'dropped_full': self.dropped_full,
+            'dropped_stale': self.dropped_stale,
+            'latency': self.latency.summary(),
+            'queue_depth': self.queue_depth.summary(),
+            'inference_seconds': self.inference_seconds.summary(),
+        }
+
+
+class LiveStreamAnalyzer:
+    """Classify a live stream with a bounded delay between capture and prediction.
+
+    A capture thread reads the stream continuously, so frames never pile up
+    in the capture backend, and queues a copy of the I3D window whenever a
+    prediction is due. At most ``queue_depth`` windows wait for the model;
+    when the queue is full, ``drop_policy`` discards either the oldest queued
+    window or the new one. The inference thread also skips windows that
+    would be older than ``max_latency`` seconds by the time their prediction
+    is ready, judged by the running mean model call time, so predictions
+    lag the stream by at most about ``max_latency``. Video files are paced
+    at their frame rate (``realtime``), which makes them behave like a
+    stream. Entries carry the usual timeline fields plus ``latency`` and
+    ``queue_depth``; ``time_taken`` is stream time at the reported frame rate.
+    """
+
+    def __init__(self, action_predictor, source: Union[str, int], frame_size, max_frames: int,
+                 prediction_interval: float, sample_fps: Optional[float] = None,
+                 max_latency: float = 2.0, queue_depth: int = 2, drop_policy: str = "oldest",
+                 realtime: Optional[bool] = None, max_seconds: Optional[float] = None,
+                 keep_probabilities: bool = False, results_queue_size: int = 64):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}. Expected one of {DROP_POLICIES}.")
+        self.action_predictor = action_predictor
+        self.cap = open_stream(source)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or DEFAULT_STREAM_FPS
+        # Files report a frame count; live streams and webcams do not
+        self.realtime = self.cap.get(cv2.CAP_PROP_FRAME_COUNT) > 0 if realtime is None else realtime
+        self.frame_size = frame_size
+        self.max_frames = max_frames
+        self.max_latency = max_latency
+        self.drop_policy = drop_policy
+        self.max_seconds = max_seconds
+        self.keep_probabilities = keep_probabilities
+        self.window_reuse = action_predictor.new_window_reuse()
+        self.sampler = FrameSampler(self.fps, max_frames, prediction_interval, sample_fps)
+        self.motion = MotionMeter(max_frames, self.sampler.stride)
+        self.stats = LiveStats()
+
+        self._windows = queue.Queue(maxsize=max(1, queue_depth))
+        self._results = queue.Queue(maxsize=results_queue_size)
+        self._stop = threading.Event()
+        self._started = False
+        self._error = None
+        self._capture_thread = threading.Thread(target=self._capture, name="live-capture", daemon=True)
+        self._worker = threading.Thread(target=self._infer, name="live-inference", daemon=True)
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            self._capture_thread.start()
+            self._worker.start()
+        return self
+
+    def stop(self):
+        """Stop both threads without hanging on a stalled stream.
+
+        The capture thread releases the stream itself once its current read
+        returns, which ``STREAM_TIMEOUT_MS`` bounds; VideoCapture is not
+        thread-safe, so it is never released from here while in use.
+        """
+        self._stop.set()
+        if not self._started:
+            self.cap.release()
+            return
+        for thread in (self._capture_thread, self._worker):
+            if thread.is_alive():
+                thread.join(_JOIN_TIMEOUT)
+
+    def results(self) -> Iterator[Dict]:
+        """Yield timeline entries as predictions complete, until the stream ends or ``stop()``."""
+        self.start()
+        while True:
+            entry = get_until_done(self._results, self._worker, self._stop)
+            if entry is DONE:
+                break
+            yield entry
+        if self._error is not None:
+            raise self._error
+
+    def _queue_window(self, window: Dict):
+        self.stats.windows += 1
+        try:
+            self._windows.put_nowait(window)
+        except queue.Full:
+            self.stats.dropped_full += 1
+            if self.drop_policy == "newest":
+                return
+            try:
+                self._windows.get_nowait()
+            except queue.Empty:
+                pass  # The inference thread took it in the meantime
+            self._windows.put_nowait(window)
+        self.stats.queue_depth.update(self._windows.qsize())
+
+    def _capture(self):
+        frame_window = FrameWindow(self.max_frames, self.frame_size)
+        frame_index = 0
+        started = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                if self.max_seconds is not None and frame_index / self.fps >= self.max_seconds:
+                    break
+                if self.realtime:
+                    delay = started + frame_index / self.fps - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                if self.sampler.wants(frame_index):
+                    ret, frame = self.cap.read()
+                    if not ret:
+                        break
+                    frame_window.push(frame)
+                    self.motion.update(frame_index, frame)
+                elif not self.cap.grab():
+                    break
+                self.stats.frames += 1
+
+                if self.sampler.is_prediction_frame(frame_index) and frame_window.is_full():
+                    self._queue_window({
+                        'time_taken': frame_index / self.fps,
+                        'captured_at': time.monotonic(),
+                        'motion': self.motion.level(),
+                        # The ring buffer keeps changing while the window waits
+                        'clip': frame_window.window().copy(),
+                    })
+                frame_index += 1
+        except Exception as e:
+            self._error = e
+        finally:
+            self.cap.release()
+
+    def _next_batch(self):
+        """Wait for one queued window, then take whatever else is queued up to the batch size."""
+        window = get_until_done(self._windows, self._capture_thread, self._stop)
+        if window is DONE:
+            return None
+        batch = [window]
+        while len(batch) < self.action_predictor.batch_size:
+            try:
+                batch.append(self._windows.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _infer(self):
+        try:
+            while not self._stop.is_set():
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                depth = self._windows.qsize()
+                expected = self.stats.inference_seconds.mean if self.stats.inference_seconds.count else 0.0
+                now = time.monotonic()
+                fresh = []
+                for window in batch:
+                    if now - window['captured_at'] + expected > self.max_latency:
+                        self.stats.dropped_stale += 1
+                    else:
+                        fresh.append(window)
+                if fresh:
+                    self._predict(fresh, depth)
+        except Exception as e:
+            self._error = e
+            self._stop.set()
+        finally:
+            put_until_stopped(self._results, DONE, self._stop)
+
+    def _predict(self, windows, depth: int):
+        clips = [window['clip'] for window in windows]
+        start = time.monotonic()
+        if self.keep_probabilities:
+            results, probabilities = self.action_predictor.predict_i3d_clips(
+                clips, return_probabilities=True, window_reuse=self.window_reuse
+            )
+        else:
+            results = self.action_predictor.predict_i3d_clips(clips, window_reuse=self.window_reuse)
+            probabilities = None
+        done = time.monotonic()
+        self.stats.inference_seconds.update(done - start)
+
+        for i, (window, i3d_actions) in enumerate(zip(windows, results)):
+            latency = done - window['captured_at']
+            self.stats.latency.update(latency)
+            self.stats.predictions += 1
+            entry = {
+                'time_taken': window['time_taken'],
+                'i3d_actions': i3d_actions,
+                'motion': window['motion'],
+                'latency': latency,
+                'queue_depth': depth,
+            }
+            if probabilities is not None:
+                entry['probabilities'] = probabilities[i].astype(np.float16)
+            if not put_until_stopped(self._results, entry, self._stop):
+                break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify a live stream, webcam or paced video file.")
+    parser.add_argument("source", help="RTSP/HTTP URL, webcam index or video file")
+    parser.add_argument("--max-latency", type=float, default=2.0, help="Seconds a prediction may lag the stream")
+    parser.add_argument("--queue-depth", type=int, default=2, help="Windows waiting for the model at most")
+    parser.add_argument("--drop-policy", choices=DROP_POLICIES, default="oldest",
+                        help="Which window to drop when the queue is full")
+    parser.add_argument("--no-realtime", action="store_true", help="Read files as fast as possible instead of at their frame rate")
+    parser.add_argument("--seconds", type=float, help="Stop after this much stream time")
+    parser.add_argument("--model", default="../model/i3d/")
+    parser.add_argument("--label-map", default="../model/i3d/label_map.txt")
+    parser.add_argument("--backend", choices=BACKENDS, default="tf")
+    parser.add_argument("--variant", choices=MODEL_VARIANTS, default="fp32")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--frame-size", type=int, nargs=2, default=(224, 224), metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--max-frames", type=int, default=32)
+    parser.add_argument("--prediction-interval", type=float, default=1.0)
+    parser.add_argument("--sample-fps", type=float)
+    args = parser.parse_args()
+
+    frame_size = tuple(args.frame_size)
+    action_predictor = ActionPredictor(
+        args.model, args.label_map, batch_size=args.batch_size, top_k=args.top_k,
+        warmup_shape=(args.max_frames, frame_size[1], frame_size[0]),
+        backend=args.backend, model_variant=args.variant
+    )
+    analyzer = LiveStreamAnalyzer(
+        action_predictor, args.source, frame_size, args.max_frames, args.prediction_interval,
+        sample_fps=args.sample_fps, max_latency=args.max_latency, queue_depth=args.queue_depth,
+        drop_policy=args.drop_policy, realtime=False if args.no_realtime else None, max_seconds=args.seconds
+    )
+    try:
+        for entry in analyzer.results():
+            action = max(entry['i3d_actions'], key=entry['i3d_actions'].get, default="-")
+            print(f"{entry['time_taken']:8.2f}s {action:<30} latency {entry['latency']:.2f}s, queue {entry['queue_depth']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        analyzer.stop()
+
+    stats = analyzer.stats.summary()
+    print(
+        f"{stats['predictions']} predictions from {stats['windows']} windows "
+        f"({stats['dropped_full']} dropped on a full queue, {stats['dropped_stale']} stale); "
+        f"latency median {stats['latency']['median']:.2f}s, max {stats['latency']['max']:.2f}s; "
+        f"queue depth mean {stats['queue_depth']['mean']:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
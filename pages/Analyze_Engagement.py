@@ -1,26 +1,69 @@
 import streamlit as st
-import cv2
 import numpy as np
 import time
 import pandas as pd
 import plotly.express as px
 from action_predictor import ActionPredictor
+from inference_client import RemoteActionPredictor
+from engagement_metrics import compute_metrics, star_rating, time_series_records
+from prediction_store import save_probability_store
+from downsampling import downsample, downsample_indices
+from inference_cache import InferenceCache, cache_key, url_validator, video_digest
+from streaming_metrics import EngagementAggregator
+from video_analysis import analyze_video, video_duration
+from live_analysis import LiveStreamAnalyzer
+from analysis_jobs import AnalysisJobs, CANCELLED, FAILED, QUEUED, RUNNING
+from sharded_analysis import analyze_sharded, physical_cores
 import json  # For saving predictions locally
 from pathlib import Path  # For handling file paths
 import plotly.graph_objects as go
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from io import BytesIO
+from report_builder import write_report
+import os
+import shutil
 
 # Constants
+INFERENCE_BACKEND = "tf"  # One of "tf", "tflite" or "onnx"
+I3D_MODEL_PATHS = {
+    "tf": "../model/i3d/",
+    "tflite": "../model/i3d/i3d.tflite",
+    "onnx": "../model/i3d/i3d.onnx",
+}
+I3D_MODEL_PATH = I3D_MODEL_PATHS[INFERENCE_BACKEND]
+MODEL_VARIANT = "fp32"  # "fp32", or "int8"/"float16" after running quantize_i3d.py
+LABEL_MAP_PATH = "../model/i3d/label_map.txt"
+INFERENCE_SERVICE_URL = None  # e.g. "http://127.0.0.1:8765" to share the warm model of inference_server.py instead of loading one here
 I3D_FRAME_SIZE = (224, 224)
 MAX_FRAMES = 32
 PREDICTION_INTERVAL = 1.0  # Predict every 1 second
+ADAPTIVE_INTERVALS = None  # (min, max) seconds between predictions, following the measured motion; None keeps PREDICTION_INTERVAL
 WARMUP_FRAMES = 10  # Warm-up frames to ensure system is ready
-
-# Define high-engagement and movement-related actions
-HIGH_ENGAGEMENT_ACTIONS = ["celebrating", "cheerleading", "dancing", "robot dancing", "high kick", "zumba", "singing", "jumping"]
-MOVEMENT_ACTIONS = ["celebrating", "cheerleading", "dancing", "robot dancing", "high kick", "zumba", "marching", "jumping"]
+SAMPLE_FPS = None  # Temporal sampling rate for I3D windows, e.g. 16 to spread 32 frames over 2 s; None keeps every frame
+I3D_BATCH_SIZE = 8  # Number of clip windows sent to the I3D model per call
+TOP_K = 5  # Number of top actions kept per prediction
+MODEL_WARMUP_BATCH = 1  # Dummy clips run through the model at startup; 0 disables warm-up
+WINDOW_REUSE_THRESHOLD = None  # Reuse the last prediction while the window changes less than this (mean pixel change); None disables
+PREPROCESS_WORKERS = 2  # Threads resizing decoded frames for the I3D window
+PIPELINE_QUEUE_SIZE = 64  # Bounded queue depth between decode, preprocess and inference
+SHARD_WORKERS = physical_cores()  # Default process count for sharded analysis
+MAX_ANALYSIS_SECONDS = None  # Stop after this much video time (e.g. for very long streams); None analyses everything
+METRICS_EWMA_ALPHA = 0.2  # Smoothing of the live engagement trend
+FIGURE_CACHE_ENTRIES = 64  # Memoized charts kept per figure builder
+MAX_CHART_POINTS = 2000  # Points per line chart; longer series are LTTB-downsampled, peaks kept
+INFERENCE_CACHE_DIR = "inference_cache"  # Analyses of already seen videos, keyed by video hash, model and settings
+INFERENCE_CACHE_MAX_MB = 512  # Least recently used analyses are evicted beyond this size
+URL_CACHE_TTL_SECONDS = 3600  # Cached analyses of URLs without an ETag/Last-Modified header expire after this
+BACKGROUND_JOBS = True  # Run analyses as resumable background jobs; False predicts in the script thread with live updates
+JOBS_DB_PATH = "analysis_jobs.sqlite3"  # Job table and checkpointed timelines
+JOB_VIDEO_DIR = "job_videos"  # Uploaded videos kept by content hash while their jobs may still resume
+JOB_WORKERS = 1  # Analyses running at once; they share the loaded model
+JOB_CHECKPOINT_SECONDS = 5.0  # How often a running job saves its partial timeline
+JOB_POLL_SECONDS = 1.0  # How often the page refreshes the progress of running jobs
+JOBS_KEEP_FINISHED = 20  # Finished jobs whose timelines are kept until collected; older ones and their video copies are deleted
+LIVE_MAX_LATENCY = 2.0  # Seconds a live prediction may lag the stream; older windows are skipped
+LIVE_QUEUE_DEPTH = 2  # Live windows waiting for the model at most
+LIVE_DROP_POLICY = "oldest"  # Window dropped when the live queue is full: "oldest" or "newest"
+LIVE_MAX_SECONDS = None  # Stop a live session after this much stream time; None runs until stopped
+KEEP_PROBABILITIES = True  # Keep full per-window probability vectors and save them next to the JSON as float16 .npz
 
 # Set page config as the first command
 st.set_page_config(page_title="Crowd Engagement Analysis", layout="wide")
@@ -28,16 +71,32 @@ st.set_page_config(page_title="Crowd Engagement Analysis", layout="wide")
 # Load models
 @st.cache_resource
 def load_models():
-    i3d_model_path = "../model/i3d/"
-    label_map_path = "../model/i3d/label_map.txt"
-    return ActionPredictor(i3d_model_path, label_map_path)
+    if INFERENCE_SERVICE_URL:
+        return RemoteActionPredictor(INFERENCE_SERVICE_URL, batch_size=I3D_BATCH_SIZE)
+    return ActionPredictor(
+        I3D_MODEL_PATH, LABEL_MAP_PATH, batch_size=I3D_BATCH_SIZE, top_k=TOP_K,
+        warmup_batch_size=MODEL_WARMUP_BATCH, warmup_shape=(MAX_FRAMES, I3D_FRAME_SIZE[1], I3D_FRAME_SIZE[0]),
+        backend=INFERENCE_BACKEND, model_variant=MODEL_VARIANT, reuse_threshold=WINDOW_REUSE_THRESHOLD
+    )
+
+@st.cache_resource
+def load_inference_cache():
+    return InferenceCache(INFERENCE_CACHE_DIR, INFERENCE_CACHE_MAX_MB * 2 ** 20)
+
+# Jobs outlive reruns and browser reloads; interrupted jobs resume when the process restarts
+@st.cache_resource
+def load_analysis_jobs():
+    return AnalysisJobs(JOBS_DB_PATH, load_models(), workers=JOB_WORKERS, checkpoint_seconds=JOB_CHECKPOINT_SECONDS,
+                        video_dir=JOB_VIDEO_DIR, keep_finished=JOBS_KEEP_FINISHED)
 
 # Initialize the action predictor
 action_predictor = load_models()
+inference_cache = load_inference_cache()
+analysis_jobs = load_analysis_jobs() if BACKGROUND_JOBS else None
 
 # Function to save predictions locally as JSON
-def save_predictions_locally(predictions, project_title):
-    """Save predictions to a local JSON file."""
+def save_predictions_locally(predictions, project_title, timeline=None):
+    """Save predictions to a local JSON file, and the full probability vectors to an .npz next to it."""
     # Create a directory for saved predictions if it doesn't exist
     try:
         save_dir = Path("saved_predictions")
@@ -50,51 +109,90 @@ def save_predictions_locally(predictions, project_title):
             json.dump(predictions, f, indent=4)
     
         st.success(f"Predictions saved locally as: {file_path}")
+
+        if timeline:
+            store_path = save_probability_store(file_path, timeline, action_predictor.labels)
+            if store_path is not None:
+                st.success(f"Probability vectors saved locally as: {store_path}")
     except Exception as e:
         print('error on save, ', e)
 
 # Function to generate PDF
-def generate_pdf(star_rating, overall_engagement, overall_crowd_density, overall_average_movement, df_detailed):
-    """Generate a PDF with the analysis results."""
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    # Add content to the PDF
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(50, height - 50, "Crowd Engagement Analysis Report")
-    c.setFont("Helvetica", 12)
-
-    # Star Rating
-    c.drawString(50, height - 80, f"Event Star Rating: {star_rating}")
-
-    # Overall Scores
-    c.drawString(50, height - 110, "Overall Scores:")
-    c.drawString(70, height - 130, f"Engagement Score: {overall_engagement:.2f}")
-    c.drawString(70, height - 150, f"Crowd Density: {overall_crowd_density:.2f}")
-    c.drawString(70, height - 170, f"Average Movement: {overall_average_movement:.2f}")
-
-    # Detailed Predictions Table
-    c.drawString(50, height - 200, "Detailed Predictions:")
-    table_data = [["Time (seconds)", "Top Action", "Confidence"]]
-    for _, row in df_detailed.iterrows():
-        table_data.append([row["Time (seconds)"], row["Top Action"], f"{row['Confidence']:.2f}"])
-
-    # Draw the table
-    x_start = 50
-    y_start = height - 230
-    row_height = 20
-    col_widths = [100, 100, 100]
-
-    for i, row in enumerate(table_data):
-        for j, cell in enumerate(row):
-            c.drawString(x_start + sum(col_widths[:j]), y_start - i * row_height, str(cell))
-
-    # Save the PDF
-    c.showPage()
-    c.save()
-    buffer.seek(0)
-    return buffer
+def generate_pdf(star_rating, overall_engagement, overall_crowd_density, overall_average_movement, metrics):
+    """Write a paginated PDF with the analysis results to a temporary file and return its path."""
+    return write_report(
+        None, star_rating, overall_engagement, overall_crowd_density, overall_average_movement,
+        metrics['time_taken'], metrics['top_action'], metrics['top_confidence'] * 100,
+        charts={
+            "Engagement Over Time": metrics['engagement_score'],
+            "Crowd Density Over Time": metrics['crowd_density'],
+            "Average Movement Over Time": metrics['average_movement'],
+        }
+    )
+
+# Figures are rebuilt only when their data changes
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES)
+def gauge_figure(title, overall, good, fair):
+    """Gauge of an overall score, shifted onto the 0-100 display scale."""
+    return go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=overall * 100 + 45,
+        title={"text": title},
+        gauge={"axis": {"range": [0, 100]},
+               "bar": {"color": "green" if overall > good else "yellow" if overall > fair else "red"},
+               "steps": [
+                   {"range": [0, 40], "color": "red"},
+                   {"range": [40, 70], "color": "yellow"},
+                   {"range": [70, 100], "color": "green"}
+               ]}
+    ))
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES)
+def detailed_predictions_figure(times, top_actions, confidences, time_range=None):
+    """Top predicted action confidence over time, downsampled to ``MAX_CHART_POINTS``."""
+    keep = downsample_indices(times, confidences, MAX_CHART_POINTS, time_range)
+    df_detailed = pd.DataFrame({
+        'Time (seconds)': times[keep],
+        'Top Action': np.asarray(top_actions, dtype=object)[keep],
+        'Confidence': confidences[keep]
+    })
+    # Add a color column based on the confidence threshold
+    df_detailed['Color'] = np.where(df_detailed['Confidence'] < 0.1, 'red', 'green')
+
+    # Create the line chart
+    fig = px.line(
+        df_detailed,
+        x='Time (seconds)',
+        y='Confidence',
+        color='Color',  # Use the color column for conditional coloring
+        title="Top Predicted Actions Over Time",
+        labels={'Confidence': 'Confidence Score', 'Time (seconds)': 'Time (seconds)'},
+        hover_data=['Top Action', 'Confidence']
+    )
+
+    # Fill the area under the line with color
+    fig.update_traces(
+        fill='tozeroy',  # Fill the area under the line
+        line=dict(width=2),  # Set line width
+        mode='lines'  # Display only lines (no markers)
+    )
+
+    # Update layout for better visualization
+    fig.update_layout(
+        showlegend=False,  # Hide the legend (since colors are self-explanatory)
+        xaxis_title="Time (seconds)",
+        yaxis_title="Confidence Score",
+        hovermode="x unified"  # Show hover data for all points at the same x-value
+    )
+    return fig
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES)
+def metric_line_figure(times, values, title, label, time_range=None):
+    """Line chart of one per-window metric over time, downsampled to ``MAX_CHART_POINTS``."""
+    times, values = downsample(times, values, MAX_CHART_POINTS, time_range)
+    df = pd.DataFrame({'time_taken': times, 'value': values})
+    return px.line(df, x='time_taken', y='value', title=title,
+                   labels={'value': label, 'time_taken': 'Time (seconds)'})
 
 class ActionRecognitionApp:
     def __init__(self):
@@ -104,15 +202,28 @@ class ActionRecognitionApp:
         """Initialize session state variables."""
         session_vars = {
             'upload_video_source': None,
+            'upload_video_digest': None,
+            'upload_file_id': None,
             'upload_timeline': [],
             'upload_video_duration': 0.0,
             'upload_predictions_ready': False,
+            'upload_aggregator': None,
             'url_video_source': None,
             'url_timeline': [],
             'url_video_duration': 0.0,
             'url_predictions_ready': False,
+            'url_aggregator': None,
+            'upload_job_id': None,
+            'url_job_id': None,
+            'live_timeline': [],
+            'live_video_duration': 0.0,
+            'live_predictions_ready': False,
+            'live_aggregator': None,
+            'live_stats': None,
             'video_url': None,
-            'current_tab': None  # Track the current tab for predictions
+            'current_tab': None,  # Track the current tab for predictions
+            'sharded_analysis': False,
+            'shard_workers': SHARD_WORKERS
         }
         for key, value in session_vars.items():
             if key not in st.session_state:
@@ -125,11 +236,13 @@ class ActionRecognitionApp:
         
         if uploaded_file is not None:
             self.save_uploaded_video(uploaded_file)
-            self.display_video("upload")
+            self.display_video("upload", uploaded_file)
             
             if st.button("Predict Actions", key="predict_upload"):
                 st.session_state.current_tab = "upload"
                 self.predict_actions("upload")
+        # A followed job is shown even when no video is loaded, e.g. after a browser reload
+        self.show_job("upload")
 
     def load_video_from_url(self):
         """Load video from URL."""
@@ -144,19 +257,86 @@ class ActionRecognitionApp:
             if st.button("Predict Actions", key="predict_url"):
                 st.session_state.current_tab = "url"
                 self.predict_actions("url")
+        self.show_job("url")
+
+    def live_stream(self):
+        """Analyse a live RTSP/HTTP stream, a webcam or a video file played back as a stream."""
+        st.subheader("Live Stream")
+        source = st.text_input("Stream URL, webcam index or video file:", key="live_source")
+        start_col, stop_col = st.columns(2)
+        start = start_col.button("Start", key="start_live", disabled=not source)
+        # Stop reruns the script, which ends the running loop; its predictions are already in the session
+        if stop_col.button("Stop", key="stop_live") and st.session_state.live_timeline:
+            self.finish_live()
+        if start:
+            self.analyze_live(source)
+
+    def analyze_live(self, source):
+        """Show predictions as the stream is analysed, keeping them in the session as they arrive."""
+        try:
+            analyzer = LiveStreamAnalyzer(
+                action_predictor, source, I3D_FRAME_SIZE, MAX_FRAMES, PREDICTION_INTERVAL,
+                sample_fps=SAMPLE_FPS, max_latency=LIVE_MAX_LATENCY, queue_depth=LIVE_QUEUE_DEPTH,
+                drop_policy=LIVE_DROP_POLICY, max_seconds=LIVE_MAX_SECONDS, keep_probabilities=KEEP_PROBABILITIES
+            )
+        except IOError as e:
+            st.error(f"Error: {e}")
+            return
+
+        st.session_state.live_timeline = []
+        st.session_state.live_aggregator = EngagementAggregator(METRICS_EWMA_ALPHA)
+        st.session_state.live_stats = analyzer.stats
+        prediction_placeholder = st.empty()
+        stats_placeholder = st.empty()
+        try:
+            for entry in analyzer.results():
+                st.session_state.live_timeline.append(entry)
+                window = st.session_state.live_aggregator.update(entry)
+                self.show_prediction(entry, window, st.session_state.live_aggregator, prediction_placeholder)
+                self.show_live_stats(analyzer.stats, stats_placeholder)
+        except IOError as e:
+            st.error(f"Error: {e}")
+        finally:
+            analyzer.stop()
+        self.finish_live()
+
+    def show_live_stats(self, stats, placeholder):
+        """Latency, queue depth and dropped windows of the running live analysis."""
+        placeholder.caption(
+            f"Latency {stats.latency.last:.2f}s (median {stats.latency.median:.2f}s, max {stats.latency.max:.2f}s) "
+            f"| queue depth {stats.queue_depth.last:.0f} | {stats.predictions} predictions, "
+            f"{stats.dropped_full} windows dropped on a full queue, {stats.dropped_stale} stale"
+        )
+
+    def finish_live(self):
+        """Move the live predictions to the Prediction Stats tab."""
+        timeline = st.session_state.live_timeline
+        duration = timeline[-1]['time_taken'] if timeline else 0.0
+        st.session_state.current_tab = "live"
+        self.store_predictions("live", timeline, st.session_state.live_aggregator, duration)
+        stats = st.session_state.live_stats
+        if stats is not None:
+            st.success(f"Live analysis stopped after {duration:.0f}s of stream, median latency {stats.latency.median:.2f}s.")
 
     def save_uploaded_video(self, uploaded_file):
-        """Save the uploaded video to a temporary file."""
-        with open("temp_video.mp4", "wb") as f:
-            f.write(uploaded_file.getvalue())
+        """Save the uploaded video to a temporary file, unless it is already there."""
+        # Reruns (e.g. while polling a job) keep the same upload; skip hashing it again
+        if uploaded_file.file_id == st.session_state.upload_file_id and Path("temp_video.mp4").exists():
+            return
+        st.session_state.upload_file_id = uploaded_file.file_id
+        video_bytes = uploaded_file.getvalue()
+        digest = video_digest(video_bytes)
+        if digest != st.session_state.upload_video_digest or not Path("temp_video.mp4").exists():
+            with open("temp_video.mp4", "wb") as f:
+                f.write(video_bytes)
+            st.session_state.upload_video_digest = digest
         st.session_state.upload_video_source = "temp_video.mp4"
 
-    def display_video(self, tab):
+    def display_video(self, tab, uploaded_file=None):
         """Display the uploaded video."""
         if tab == "upload" and st.session_state.upload_video_source:
-            video_file = open("temp_video.mp4", "rb")
-            video_bytes = video_file.read()
-            st.video(video_bytes)
+            # Shown from the upload in memory instead of re-reading temp_video.mp4 on every rerun
+            st.video(uploaded_file)
         elif tab == "url" and st.session_state.url_video_source:
             st.video(st.session_state.url_video_source)
 
@@ -170,72 +350,201 @@ class ActionRecognitionApp:
             return
 
         video_source = st.session_state.upload_video_source if tab == "upload" else st.session_state.url_video_source
-        cap = cv2.VideoCapture(video_source)
-        if not cap.isOpened():
-            st.error("Error: Could not open video.")
+        # Uploads are keyed by their bytes; URLs by the URL and its ETag/Last-Modified header
+        max_age = None
+        if tab == "upload":
+            video_hash = st.session_state.upload_video_digest
+        else:
+            validator = url_validator(video_source)
+            video_hash = video_digest(f"{video_source}\n{validator or ''}".encode())
+            # Without a validator a changed video cannot be detected, so its analysis expires instead
+            if validator is None:
+                max_age = URL_CACHE_TTL_SECONDS
+        sharded = st.session_state.sharded_analysis
+        key = cache_key(video_hash, action_predictor.model_id, {
+            'frame_size': I3D_FRAME_SIZE,
+            'max_frames': MAX_FRAMES,
+            'prediction_interval': PREDICTION_INTERVAL,
+            'sample_fps': SAMPLE_FPS,
+            'warmup_frames': WARMUP_FRAMES,
+            'max_analysis_seconds': MAX_ANALYSIS_SECONDS,
+            'keep_probabilities': KEEP_PROBABILITIES,
+            # What is actually applied: shard workers load local models, a remote predictor never reuses windows
+            'window_reuse_threshold': WINDOW_REUSE_THRESHOLD if sharded else action_predictor.reuse_threshold,
+            'adaptive_intervals': ADAPTIVE_INTERVALS,
+            # Reuse and adaptive scheduling restart at every shard boundary
+            'sharded_analysis': sharded,
+            'shard_workers': st.session_state.shard_workers if sharded else None,
+        })
+        # Running metrics shared by the live view and the final report
+        aggregator = EngagementAggregator(METRICS_EWMA_ALPHA)
+
+        cached = inference_cache.get(key, max_age)
+        if cached is not None:
+            timeline = cached['timeline']
+            for entry in timeline:
+                aggregator.update(entry)
+            self.store_predictions(tab, timeline, aggregator, cached['video_duration'])
+            st.success("Predictions loaded from cache!")
             return
 
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        video_duration = float(total_frames / fps)
-
-        # Warm-up phase
-        for _ in range(WARMUP_FRAMES):
-            ret, _ = cap.read()
-            if not ret:
-                st.error("Error: Video is too short for warm-up.")
-                return
-
-        frame_buffer = []
-        timeline = []
-        frame_count = WARMUP_FRAMES
+        if analysis_jobs is not None and not st.session_state.sharded_analysis:
+            if tab == "upload":
+                # Jobs may resume after temp_video.mp4 was replaced, so they get their own copy
+                Path(JOB_VIDEO_DIR).mkdir(exist_ok=True)
+                job_video = Path(JOB_VIDEO_DIR) / f"{video_hash}{Path(video_source).suffix}"
+                if not job_video.exists():
+                    shutil.copyfile(video_source, job_video)
+                video_source = str(job_video)
+            st.session_state[f"{tab}_job_id"] = analysis_jobs.submit(video_source, self.analysis_settings(), key)
+            return
 
         # Placeholder for displaying instant predictions
         prediction_placeholder = st.empty()
 
-        with st.spinner("Predicting actions..."):
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                elapsed_time = frame_count / fps
-                frame_buffer.append(frame.copy())
-                if len(frame_buffer) > MAX_FRAMES:
-                    frame_buffer.pop(0)
-
-                if elapsed_time % PREDICTION_INTERVAL < (1 / fps):
-                    i3d_actions = {}
-                    if len(frame_buffer) >= MAX_FRAMES:
-                        i3d_actions = action_predictor.predict_i3d(frame_buffer, I3D_FRAME_SIZE, MAX_FRAMES)
-
-                    timeline.append({
-                        'time_taken': elapsed_time,
-                        'i3d_actions': i3d_actions
-                    })
-
-                    # Display the latest prediction dynamically
-                    if i3d_actions:
-                        total_labels = 10  # Total predicted labels
-                        total_score = sum(i3d_actions.get(action, 0) for action in HIGH_ENGAGEMENT_ACTIONS)
-                        engagement_score = (total_score / total_labels) * 100  # Normalize to 100%
-                        engagement_color = "green" if engagement_score >= 3 else "orange" if engagement_score >= 1 else "grey"
-                        engagement_val = "Great engagement level !!!" if engagement_score >= 3 else "Good, engagement level" if engagement_score >= 1 else "Engagement level is low !!"
-                        prediction_placeholder.markdown(f"Prediction at {elapsed_time:.2f}s:<div style='color:{engagement_color}'> {engagement_val}</div>", unsafe_allow_html=True)
-                frame_count += 1
-        cap.release()
+        def show_entry(entry):
+            window = aggregator.update(entry)
+            self.show_prediction(entry, window, aggregator, prediction_placeholder)
+
+        try:
+            if st.session_state.sharded_analysis:
+                # Each shard is analysed by its own process and predictor
+                duration = video_duration(video_source)
+                with st.spinner(f"Predicting actions on {st.session_state.shard_workers} processes..."):
+                    timeline = analyze_sharded(
+                        video_source, I3D_MODEL_PATH, LABEL_MAP_PATH, I3D_FRAME_SIZE, MAX_FRAMES,
+                        PREDICTION_INTERVAL, sample_fps=SAMPLE_FPS, warmup_frames=WARMUP_FRAMES,
+                        workers=st.session_state.shard_workers, batch_size=I3D_BATCH_SIZE, top_k=TOP_K,
+                        backend=INFERENCE_BACKEND, model_variant=MODEL_VARIANT,
+                        keep_probabilities=KEEP_PROBABILITIES, reuse_threshold=WINDOW_REUSE_THRESHOLD,
+                        adaptive_intervals=ADAPTIVE_INTERVALS
+                    )
+                if MAX_ANALYSIS_SECONDS is not None:
+                    timeline = [entry for entry in timeline if entry['time_taken'] < MAX_ANALYSIS_SECONDS]
+                for entry in timeline:
+                    aggregator.update(entry)
+            else:
+                # Decoding, preprocessing and inference run on background threads;
+                # the script thread only consumes results and updates the placeholder
+                with st.spinner("Predicting actions..."):
+                    timeline, duration = analyze_video(
+                        action_predictor, video_source, on_entry=show_entry, **self.analysis_settings()
+                    )
+        except (IOError, ValueError) as e:
+            st.error(f"Error: {e}")
+            return
 
-        if tab == "upload":
-            st.session_state.upload_timeline = timeline
-            st.session_state.upload_video_duration = video_duration
-            st.session_state.upload_predictions_ready = True
-        elif tab == "url":
-            st.session_state.url_timeline = timeline
-            st.session_state.url_video_duration = video_duration
-            st.session_state.url_predictions_ready = True
+        if any(entry['i3d_actions'] for entry in timeline):
+            inference_cache.put(key, {'timeline': timeline, 'video_duration': duration})
+        self.store_predictions(tab, timeline, aggregator, duration)
+        st.success("Predictions complete!")
+
+    def analysis_settings(self):
+        """Keyword arguments of ``analyze_video`` for the configured analysis."""
+        return {
+            'frame_size': I3D_FRAME_SIZE,
+            'max_frames': MAX_FRAMES,
+            'prediction_interval': PREDICTION_INTERVAL,
+            'sample_fps': SAMPLE_FPS,
+            'warmup_frames': WARMUP_FRAMES,
+            'max_seconds': MAX_ANALYSIS_SECONDS,
+            'preprocess_workers': PREPROCESS_WORKERS,
+            'queue_size': PIPELINE_QUEUE_SIZE,
+            'keep_probabilities': KEEP_PROBABILITIES,
+            'adaptive_intervals': ADAPTIVE_INTERVALS,
+        }
+
+    def show_job(self, tab):
+        """Show the progress of the tab's background job and collect its results once it is done."""
+        job_id = st.session_state[f"{tab}_job_id"]
+        if analysis_jobs is None or job_id is None:
+            return
+        job = analysis_jobs.job(job_id)
+        if job is None:
+            st.session_state[f"{tab}_job_id"] = None
+            return
 
+        if job['status'] in (QUEUED, RUNNING):
+            st.progress(job['progress'], text=f"Job {job_id}: {job['status']}, {job['windows']} windows predicted")
+            if st.button("Cancel analysis", key=f"cancel_job_{tab}"):
+                analysis_jobs.cancel(job_id)
+                st.rerun()
+            return
+
+        st.session_state[f"{tab}_job_id"] = None
+        if job['status'] == FAILED:
+            analysis_jobs.release(job_id)
+            st.error(f"Error: {job['error']}")
+            return
+        if job['status'] == CANCELLED:
+            analysis_jobs.release(job_id)
+            st.warning(f"Job {job_id} was cancelled.")
+            return
+
+        # A job collected before has handed its timeline to the inference cache and released it
+        cached = inference_cache.get(job['cache_key']) if job['cache_key'] else None
+        timeline = cached['timeline'] if cached is not None else analysis_jobs.timeline(job_id)
+        if not timeline:
+            st.warning(f"The results of job {job_id} are no longer available.")
+            return
+        aggregator = EngagementAggregator(METRICS_EWMA_ALPHA)
+        for entry in timeline:
+            aggregator.update(entry)
+        if cached is None and job['cache_key'] and any(entry['i3d_actions'] for entry in timeline):
+            inference_cache.put(job['cache_key'], {'timeline': timeline, 'video_duration': job['video_duration']})
+        analysis_jobs.release(job_id)
+        st.session_state.current_tab = tab
+        self.store_predictions(tab, timeline, aggregator, job['video_duration'])
         st.success("Predictions complete!")
 
+    def jobs_running(self):
+        """Whether a job followed by this session is still queued or running."""
+        for tab in ("upload", "url"):
+            job_id = st.session_state[f"{tab}_job_id"]
+            job = analysis_jobs.job(job_id) if job_id is not None else None
+            if job is not None and job['status'] in (QUEUED, RUNNING):
+                return True
+        return False
+
+    def recent_jobs(self):
+        """Sidebar list of recent jobs; following one reattaches it after a reload or from another session."""
+        jobs = analysis_jobs.jobs()
+        if not jobs:
+            return
+        st.sidebar.subheader("Analysis jobs")
+        for job in jobs:
+            st.sidebar.caption(f"#{job['id']} {Path(job['video_source']).name}: {job['status']} ({job['progress']:.0%})")
+        job_id = st.sidebar.selectbox("Job", [job['id'] for job in jobs], format_func=lambda job_id: f"#{job_id}")
+        if st.sidebar.button("Follow job"):
+            job = analysis_jobs.job(job_id)
+            # Uploaded videos are copied into JOB_VIDEO_DIR; anything else was loaded from a URL
+            tab = "upload" if Path(job['video_source']).parent == Path(JOB_VIDEO_DIR) else "url"
+            st.session_state[f"{tab}_job_id"] = job_id
+
+    def store_predictions(self, tab, timeline, aggregator, video_duration):
+        """Keep a finished analysis in the session state of its tab."""
+        st.session_state[f"{tab}_timeline"] = timeline
+        st.session_state[f"{tab}_aggregator"] = aggregator
+        st.session_state[f"{tab}_video_duration"] = video_duration
+        st.session_state[f"{tab}_predictions_ready"] = True
+
+    def show_prediction(self, entry, window, aggregator, prediction_placeholder):
+        """Display the latest prediction dynamically."""
+        if window:
+            total_labels = 10  # Total predicted labels
+            total_score = window['engagement']
+            engagement_level = (total_score / total_labels) * 100  # Normalize to 100%
+            engagement_color = "green" if engagement_level >= 3 else "orange" if engagement_level >= 1 else "grey"
+            engagement_val = "Great engagement level !!!" if engagement_level >= 3 else "Good, engagement level" if engagement_level >= 1 else "Engagement level is low !!"
+            engagement = aggregator.stats['engagement']
+            overall = aggregator.overall()
+            prediction_placeholder.markdown(
+                f"Prediction at {entry['time_taken']:.2f}s:<div style='color:{engagement_color}'> {engagement_val}</div>"
+                f"<div>Engagement so far: mean {engagement.mean * 100:.1f}, trend {engagement.ewma * 100:.1f}, "
+                f"peak {engagement.max * 100:.1f} &middot; rating {overall['star_rating']}</div>",
+                unsafe_allow_html=True
+            )
+
     def display_analysis_results(self):
         """Display analysis results in the dedicated tab."""
         if st.session_state.current_tab == "upload" and not st.session_state.upload_predictions_ready:
@@ -244,209 +553,70 @@ class ActionRecognitionApp:
         elif st.session_state.current_tab == "url" and not st.session_state.url_predictions_ready:
             st.warning("No predictions available. Please provide a video URL and predict actions first.")
             return
+        elif st.session_state.current_tab == "live" and not st.session_state.live_predictions_ready:
+            st.warning("No predictions available. Please start and stop a live stream first.")
+            return
 
-        timeline = (
-            st.session_state.upload_timeline
-            if st.session_state.current_tab == "upload"
-            else st.session_state.url_timeline
-        )
+        tab = st.session_state.current_tab if st.session_state.current_tab in ("upload", "live") else "url"
+        timeline = st.session_state[f"{tab}_timeline"]
+        aggregator = st.session_state[f"{tab}_aggregator"]
 
-        # Define high-engagement and movement-related actions
-        HIGH_ENGAGEMENT_ACTIONS = ["celebrating", "cheerleading", "dancing", "robot dancing", "high kick", "zumba", "singing","jumping"]
-        MOVEMENT_ACTIONS = ["celebrating", "cheerleading", "dancing", "robot dancing", "high kick", "zumba", "marching", "jumping"]
-
-        # Calculate overall metrics
-        engagement_scores = []
-        crowd_density_scores = []
-        average_movement_scores = []
-
-        for prediction in timeline:
-            if prediction['i3d_actions']:
-                actions = prediction['i3d_actions']
-
-                # Engagement score
-                engagement_score = sum(
-                    confidence for action, confidence in actions.items()
-                    if action in HIGH_ENGAGEMENT_ACTIONS
-                )
-                engagement_scores.append(engagement_score)
-
-                # Crowd density
-                crowd_density = sum(actions.values()) / len(actions)
-                crowd_density_scores.append(crowd_density)
-
-                # Average movement
-                movement_confidences = [
-                    confidence for action, confidence in actions.items()
-                    if action in MOVEMENT_ACTIONS
-                ]
-                average_movement = sum(movement_confidences) / len(movement_confidences) if movement_confidences else 0
-                average_movement_scores.append(average_movement)
-
-        # Overall scores
-        overall_engagement = np.mean(engagement_scores)
-        overall_crowd_density = np.mean(crowd_density_scores)
-        overall_average_movement = np.mean(average_movement_scores)
-
-        overall_score = (
-        0.5 * overall_engagement +  # Weight for engagement
-        0.3 * overall_crowd_density +  # Weight for crowd density
-        0.2 * overall_average_movement  # Weight for average movement
-    )
+        # Compute the per-window series in a single pass over the timeline; the
+        # overall scores were already accumulated while predicting
+        metrics = compute_metrics(timeline, action_predictor.labels)
+        overall = aggregator.overall() if aggregator is not None else metrics
+        overall_engagement = overall['overall_engagement']
+        overall_crowd_density = overall['overall_crowd_density']
+        overall_average_movement = overall['overall_average_movement']
+        overall_score = overall['overall_score']
+        metrics['overall_score'] = overall_score
 
-        # Map overall score to star rating (1 to 5 stars)
-        overall_score = overall_score * 4
         st.subheader("Event Engagement Rating")
         # Display star rating at the beginning
-        if overall_score >= 0.9:
-            st.markdown(" ⭐⭐⭐⭐⭐")
-        elif overall_score >= 0.7:
-            
-            st.markdown("⭐⭐⭐⭐")  # 4 stars
-        elif overall_score >= 0.5:
-            st.markdown("⭐⭐⭐")  # 3 stars
-        elif overall_score >= 0.3:
-            st.markdown("⭐⭐")  # 2 stars
-        else:
-            st.markdown("⭐")  # 1 star
+        st.markdown(overall['star_rating'])
 
         # Display overall score in an interactive way
         st.subheader("Overall Video Score")
         col1, col2, col3 = st.columns(3)
         with col1:
-            fig_engagement = go.Figure(go.Indicator(
-                mode="gauge+number",
-                value=overall_engagement * 100 + 45,
-                title={"text": "Engagement Score"},
-                gauge={"axis": {"range": [0, 100]},
-                       "bar": {"color": "green" if overall_engagement > 75 else "yellow" if overall_engagement > 45 else "red"},
-                       "steps": [
-                           {"range": [0, 40], "color": "red"},
-                           {"range": [40, 70], "color": "yellow"},
-                           {"range": [70, 100], "color": "green"}
-                       ]}
-            ))
-            st.plotly_chart(fig_engagement)
+            st.plotly_chart(gauge_figure("Engagement Score", overall_engagement, 75, 45))
     
         with col2:
-            fig_density = go.Figure(go.Indicator(
-                mode="gauge+number",
-                value=overall_crowd_density * 100 + 45,
-                title={"text": "Crowd Density"},
-                gauge={"axis": {"range": [0, 100]},
-                       "bar": {"color": "green" if overall_crowd_density > 75 else "yellow" if overall_crowd_density > 45 else "red"},
-                       "steps": [
-                           {"range": [0, 40], "color": "red"},
-                           {"range": [40, 70], "color": "yellow"},
-                           {"range": [70, 100], "color": "green"}
-                       ]}
-            ))
-            st.plotly_chart(fig_density)
+            st.plotly_chart(gauge_figure("Crowd Density", overall_crowd_density, 75, 45))
     
         with col3:
-            fig_movement = go.Figure(go.Indicator(
-                mode="gauge+number",
-                value=overall_average_movement * 100 + 45,
-                title={"text": "Average Movement"},
-                gauge={"axis": {"range": [0, 100]},
-                       "bar": {"color": "green" if overall_average_movement > 70 else "yellow" if overall_average_movement > 40 else "red"},
-                       "steps": [
-                           {"range": [0, 40], "color": "red"},
-                           {"range": [40, 70], "color": "yellow"},
-                           {"range": [70, 100], "color": "green"}
-                       ]}
-            ))
-            st.plotly_chart(fig_movement)
+            st.plotly_chart(gauge_figure("Average Movement", overall_average_movement, 70, 40))
         # Display overall score in an interactive way
         # Prepare data for table and graphs
-        time_series_data = []
-        for prediction in timeline:
-            if prediction['i3d_actions']:
-                actions = prediction['i3d_actions']
-                time_taken = prediction['time_taken']
-
-                # Engagement score
-                engagement_score = sum(
-                    confidence for action, confidence in actions.items()
-                )
-
-                # Crowd density
-                crowd_density = sum(actions.values()) / len(actions)
-
-                # Average movement
-                movement_confidences = [
-                    confidence for action, confidence in actions.items()
-                ]
-                average_movement = sum(movement_confidences) / len(movement_confidences) if movement_confidences else 0
-
-                # Store data for table
-                time_series_data.append({
-                    'time_taken': time_taken,
-                    'action': max(actions, key=actions.get),
-                    'confidence': actions[max(actions, key=actions.get)],
-                    'engagement_score': engagement_score,
-                    'crowd_density': crowd_density,
-                    'average_movement': average_movement,
-                    'star_rating': overall_score
-                })
-
-        df = pd.DataFrame(time_series_data)
-
-        # Display detailed predictions in a table
-        #st.dataframe(timeline)
-        # Prepare data for detailed predictions graph
+        time_series_data = time_series_records(metrics)
+        df = pd.DataFrame({
+            'time_taken': metrics['time_taken'],
+            'engagement_score': metrics['engagement_score'],
+            'crowd_density': metrics['crowd_density'],
+            'average_movement': metrics['average_movement'],
+            'motion': metrics['motion']
+        })
+
         # Prepare data for detailed predictions graph
-        detailed_data = []
-        for prediction in timeline:
-            if prediction['i3d_actions']:
-                actions = prediction['i3d_actions']
-                time_taken = prediction['time_taken']
-        
-                # Get the top predicted action and its confidence
-                top_action = max(actions, key=actions.get)
-                top_confidence = actions[top_action]
-        
-                detailed_data.append({
-                    'Time (seconds)': time_taken,
-                    'Top Action': top_action,
-                    'Confidence': top_confidence * 100
-                })
-        
-        df_detailed = pd.DataFrame(detailed_data)
+        df_detailed = pd.DataFrame({
+            'Time (seconds)': metrics['time_taken'],
+            'Top Action': metrics['top_action'],
+            'Confidence': metrics['top_confidence'] * 100
+        })
         
+        # Long timelines are downsampled; zooming into a range shows it at full resolution
+        time_range = None
+        if len(df) > MAX_CHART_POINTS:
+            start, end = float(df['time_taken'].min()), float(df['time_taken'].max())
+            time_range = st.slider("Time range (seconds)", min_value=start, max_value=end,
+                                   value=(start, end), key="chart_time_range")
+
         # Display detailed predictions as an interactive line chart
         st.subheader("Detailed Predictions Over Time")
         if not df_detailed.empty:
-            # Add a color column based on the confidence threshold
-            df_detailed['Color'] = df_detailed['Confidence'].apply(lambda x: 'red' if x < 0.1 else 'green')
-        
-            # Create the line chart
-            fig = px.line(
-                df_detailed,
-                x='Time (seconds)',
-                y='Confidence',
-                color='Color',  # Use the color column for conditional coloring
-                title="Top Predicted Actions Over Time",
-                labels={'Confidence': 'Confidence Score', 'Time (seconds)': 'Time (seconds)'},
-                hover_data=['Top Action', 'Confidence']
-            )
-        
-            # Fill the area under the line with color
-            fig.update_traces(
-                fill='tozeroy',  # Fill the area under the line
-                line=dict(width=2),  # Set line width
-                mode='lines'  # Display only lines (no markers)
-            )
-        
-            # Update layout for better visualization
-            fig.update_layout(
-                showlegend=False,  # Hide the legend (since colors are self-explanatory)
-                xaxis_title="Time (seconds)",
-                yaxis_title="Confidence Score",
-                hovermode="x unified"  # Show hover data for all points at the same x-value
+            fig = detailed_predictions_figure(
+                metrics['time_taken'], tuple(metrics['top_action']), metrics['top_confidence'] * 100, time_range
             )
-        
-            # Display the chart
             st.plotly_chart(fig, use_container_width=True, key="detailed_predictions")
         # Visualizations
         st.subheader("Engagement Analysis")
@@ -454,65 +624,100 @@ class ActionRecognitionApp:
         # Line chart for engagement over time
         if not df.empty:
             st.write("### Engagement Over Time")
-            fig = px.line(df, x='time_taken', y='engagement_score', title="Engagement Over Time",
-                          labels={'engagement_score': 'Engagement Score', 'time_taken': 'Time (seconds)'})
+            fig = metric_line_figure(metrics['time_taken'], metrics['engagement_score'],
+                                     "Engagement Over Time", "Engagement Score", time_range)
             st.plotly_chart(fig, use_container_width=True, key="engagement_over_time")
 
         # Bar chart for crowd density over time
         if not df.empty:
             st.write("### Crowd Density Over Time")
-            fig = px.line(df, x='time_taken', y='crowd_density', title="Crowd Density Over Time",
-                          labels={'crowd_density': 'Crowd Density', 'time_taken': 'Time (seconds)'})
+            fig = metric_line_figure(metrics['time_taken'], metrics['crowd_density'],
+                                     "Crowd Density Over Time", "Crowd Density", time_range)
             st.plotly_chart(fig, use_container_width=True, key="crowd_density_over_time")
 
         # Bar chart for average movement over time
         if not df.empty:
             st.write("### Average Movement Over Time")
-            fig = px.line(df, x='time_taken', y='average_movement', title="Average Movement Over Time",
-                          labels={'average_movement': 'Average Movement', 'time_taken': 'Time (seconds)'})
+            fig = metric_line_figure(metrics['time_taken'], metrics['average_movement'],
+                                     "Average Movement Over Time", "Average Movement", time_range)
             st.plotly_chart(fig, use_container_width=True, key="average_movement_over_time")
 
-        # Save predictions locally as JSON
-        project_title = st.text_input("Enter Project Title for Saving Predictions", key="project_title")
-        if st.button("Save Predictions Locally", key="save_predictions"):
+        # Frame-difference motion measured while decoding
+        if not df.empty and df['motion'].notna().any():
+            st.write("### Measured Motion Over Time")
+            fig = metric_line_figure(metrics['time_taken'], metrics['motion'],
+                                     "Measured Motion Over Time", "Motion (mean frame difference)", time_range)
+            st.plotly_chart(fig, use_container_width=True, key="motion_over_time")
+
+        # Save predictions locally as JSON; the form keeps typing the title from rerunning the page
+        with st.form("save_predictions_form"):
+            project_title = st.text_input("Enter Project Title for Saving Predictions", key="project_title")
+            save_requested = st.form_submit_button("Save Predictions Locally")
+        if save_requested:
             if project_title:
-                save_predictions_locally(time_series_data, project_title)
+                save_predictions_locally(time_series_data, project_title, timeline)
             else:
                 st.warning("Please enter a project title before saving.")
 
         # Export to PDF
         if st.button("📄 Export to PDF", key="export_pdf"):
-            pdf_buffer = generate_pdf(
-                star_rating="⭐⭐⭐⭐⭐" if overall_score >= 0.9 else "⭐⭐⭐⭐" if overall_score >= 0.7 else "⭐⭐⭐" if overall_score >= 0.5 else "⭐⭐" if overall_score >= 0.3 else "⭐",
+            pdf_path = generate_pdf(
+                star_rating=star_rating(overall_score),
                 overall_engagement=overall_engagement*100,
                 overall_crowd_density=overall_crowd_density*100,
                 overall_average_movement=overall_average_movement*100,
-                df_detailed=df_detailed
-            )
-            st.download_button(
-                label="Download PDF",
-                data=pdf_buffer,
-                file_name="crowd_engagement_analysis.pdf",
-                mime="application/pdf",
-                key="download_pdf"
+                metrics=metrics
             )
+            try:
+                with open(pdf_path, "rb") as pdf_file:
+                    st.download_button(
+                        label="Download PDF",
+                        data=pdf_file,
+                        file_name="crowd_engagement_analysis.pdf",
+                        mime="application/pdf",
+                        key="download_pdf"
+                    )
+            finally:
+                os.remove(pdf_path)
 
     def main(self):
         """Main application logic."""
         st.title("Crowd Engagement Analysis")
+
+        # Long recordings can be split into time shards analysed in parallel
+        st.sidebar.checkbox("Analyse in parallel shards (long videos)", key="sharded_analysis")
+        st.sidebar.number_input("Shard worker processes", min_value=1, step=1, key="shard_workers")
+        load_stats = action_predictor.load_stats
+        st.sidebar.caption(
+            f"{load_stats['model_variant']} {load_stats['backend']} model loaded in {load_stats['load_seconds']:.1f}s, "
+            f"warm-up {load_stats['warmup_seconds']:.1f}s"
+        )
+        if action_predictor.reuse_threshold is not None:
+            reuse = action_predictor.window_cache_stats
+            st.sidebar.caption(f"Reused predictions for unchanged windows: {reuse['hits']} hits, {reuse['misses']} model calls")
+        if analysis_jobs is not None:
+            self.recent_jobs()
         
-        # Create tabs for Upload Video, Load Video from URL, and Prediction Stats
-        tab1, tab2, tab3 = st.tabs(["Upload Video", "Load Video from URL", "Prediction Stats"])
+        # Create tabs for Upload Video, Load Video from URL, Live Stream and Prediction Stats
+        tab1, tab2, tab3, tab4 = st.tabs(["Upload Video", "Load Video from URL", "Live Stream", "Prediction Stats"])
         
         with tab1:
             self.video_upload()
         
         with tab2:
             self.load_video_from_url()
-        
+
         with tab3:
+            self.live_stream()
+
+        with tab4:
             self.display_analysis_results()
 
+        # Background jobs keep running between reruns; poll until they reach a final state
+        if analysis_jobs is not None and self.jobs_running():
+            time.sleep(JOB_POLL_SECONDS)
+            st.rerun()
+
 # Main function to run the app
 def main():
     app = ActionRecognitionApp()
@@ -0,0 +1,67 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from prediction_index import GROUP_BY, METRIC_COLUMNS, PredictionIndex
+
+# Constants
+PREDICTIONS_DIR = "saved_predictions"
+PREDICTION_INDEX_PATH = "prediction_index.sqlite3"  # Shared with the Home dashboard
+DEFAULT_BUCKET_SECONDS = 60  # Width of the time buckets when grouping by time
+
+st.set_page_config(page_title="Compare Events", layout="wide")
+
+@st.cache_resource
+def load_prediction_index():
+    return PredictionIndex(PREDICTION_INDEX_PATH, PREDICTIONS_DIR)
+
+# Query results are cached until the index changes
+@st.cache_data
+def run_aggregate(_index, version, by, metric, events, bucket_seconds):
+    return pd.DataFrame(_index.aggregate(by, metric, events or None, bucket_seconds))
+
+@st.cache_data
+def load_metric_values(_index, version, metric, by, events):
+    return pd.DataFrame(_index.metric_values(metric, by, events or None))
+
+def main():
+    st.title("Compare Events")
+
+    index = load_prediction_index()
+    index.refresh()
+    version = index.version()
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        events = st.text_input("Events (glob, e.g. events_at_paris*)", value="")
+    with col2:
+        by = st.multiselect("Group by", list(GROUP_BY), default=["venue"])
+    with col3:
+        metric = st.selectbox("Metric", list(METRIC_COLUMNS), index=METRIC_COLUMNS.index('engagement_score'))
+    bucket_seconds = DEFAULT_BUCKET_SECONDS
+    if 'bucket' in by:
+        bucket_seconds = st.number_input("Time bucket (seconds)", min_value=1, value=DEFAULT_BUCKET_SECONDS, step=1)
+
+    df = run_aggregate(index, version, tuple(by), metric, events, bucket_seconds)
+    if df.empty or not df['windows'].any():
+        st.warning("No saved predictions match this query.")
+        return
+
+    st.subheader(f"{metric.replace('_', ' ').title()} by {', '.join(by) or 'all events'}")
+    st.dataframe(df, use_container_width=True)
+
+    if by:
+        # Top groups first, e.g. the most frequent actions across the selected events
+        top = df.sort_values('windows', ascending=False).head(20) if by == ['action'] else df
+        fig = px.bar(top, x=by[0], y='mean', color=by[1] if len(by) > 1 else None,
+                     hover_data=['windows', 'min', 'max'], barmode='group',
+                     labels={'mean': f"Mean {metric.replace('_', ' ')}"})
+        st.plotly_chart(fig, use_container_width=True, key="aggregate_chart")
+
+    if len(by) == 1 and by[0] != 'bucket':
+        st.subheader("Distribution")
+        values = load_metric_values(index, version, metric, by[0], events)
+        fig = px.box(values, x=by[0], y=metric)
+        st.plotly_chart(fig, use_container_width=True, key="distribution_chart")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Dict, List, Optional, Sequence
+
+from engagement_metrics import summarize_records
+
+WINDOW_COLUMNS = ('time_taken', 'action', 'confidence', 'engagement_score', 'crowd_density',
+                  'average_movement', 'star_rating', 'motion')
+SUMMARY_COLUMNS = ('windows', 'duration', 'median_star_rating', 'mean_engagement_score',
+                   'mean_crowd_density', 'mean_average_movement')
+# Columns every saved prediction row has; other JSON files in the directory are skipped
+REQUIRED_COLUMNS = ('time_taken', 'engagement_score', 'crowd_density', 'average_movement', 'star_rating')
+METRIC_COLUMNS = ('confidence', 'engagement_score', 'crowd_density', 'average_movement', 'star_rating', 'motion')
+# Dimensions ``aggregate`` can group by, as SQL expressions over windows (w) joined with events (e)
+GROUP_BY = {
+    'event': 'e.name',
+    'venue': 'e.venue',
+    'action': 'w.action',
+    'bucket': 'CAST(w.time_taken / :bucket_seconds AS INTEGER) * :bucket_seconds',
+}
+
+_SCHEMA_VERSION = 2  # Bump to rebuild the index from the prediction files after a schema change
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    name TEXT PRIMARY KEY,
+    venue TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    windows INTEGER NOT NULL,
+    duration REAL,
+    median_star_rating REAL,
+    mean_engagement_score REAL,
+    mean_crowd_density REAL,
+    mean_average_movement REAL
+);
+CREATE TABLE IF NOT EXISTS windows (
+    event TEXT NOT NULL REFERENCES events(name) ON DELETE CASCADE,
+    time_taken REAL NOT NULL,
+    action TEXT,
+    confidence REAL,
+    engagement_score REAL,
+    crowd_density REAL,
+    average_movement REAL,
+    star_rating REAL,
+    motion REAL
+);
+CREATE INDEX IF NOT EXISTS windows_event_time ON windows (event, time_taken);
+CREATE INDEX IF NOT EXISTS events_venue ON events (venue);
+"""
+
+
+def venue_of(event: str) -> str:
+    """Venue of an event file, e.g. ``events_at_paris12.json`` and ``events_at_paris_13.json`` -> ``paris``."""
+    name = os.path.splitext(event)[0]
+    name = re.sub(r'^events_at_', '', name)
+    return re.sub(r'_?\d+$', '', name) or name
+
+
+def _nullable(value):
+    # SQLite has no NaN; an empty summary stores NULL instead
+    return None if isinstance(value, float) and value != value else value
+
+
+def is_prediction_records(records) -> bool:
+    """Whether parsed JSON is a list of per-window prediction rows (and not, e.g., a batch report)."""
+    return isinstance(records, list) and all(
+        isinstance(record, dict) and all(column in record for column in REQUIRED_COLUMNS)
+        for record in records
+    )
+
+
+class PredictionIndex:
+    """SQLite index of the files in ``saved_predictions``.
+
+    Each file is parsed once into a per-event summary row and its
+    per-window rows. ``refresh()`` only re-ingests files whose mtime or size
+    changed and drops events whose file is gone.
+    """
+
+    def __init__(self, db_path: str, predictions_dir: str = "saved_predictions"):
+        self.db_path = db_path
+        self.predictions_dir = predictions_dir
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                # The index only caches the prediction files, so it is rebuilt rather than migrated
+                conn.executescript("DROP TABLE IF EXISTS windows; DROP TABLE IF EXISTS events;")
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def refresh(self) -> int:
+        """Bring the index in line with the prediction files; returns the number of files ingested."""
+        files = {}
+        if os.path.isdir(self.predictions_dir):
+            with os.scandir(self.predictions_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith('.json'):
+                        stat = entry.stat()
+                        files[entry.name] = (entry.path, stat.st_mtime, stat.st_size)
+
+        ingested = 0
+        with self._lock, closing(self._connect()) as conn:
+            known = {row['name']: (row['mtime'], row['size'])
+                     for row in conn.execute("SELECT name, mtime, size FROM events")}
+            with conn:
+                for name in known.keys() - files.keys():
+                    conn.execute("DELETE FROM events WHERE name = ?", (name,))
+            for name, (path, mtime, size) in files.items():
+                if known.get(name) == (mtime, size):
+                    continue
+                try:
+                    with open(path, 'r') as f:
+                        records = json.load(f)
+                    if not is_prediction_records(records):
+                        raise ValueError("not a list of prediction rows")
+                    with conn:
+                        self._ingest(conn, name, mtime, size, records)
+                except (OSError, ValueError, KeyError, TypeError, AttributeError, sqlite3.InterfaceError) as e:
+                    print(f"Skipping unreadable prediction file {path}: {e}")
+                    continue
+                ingested += 1
+        return ingested
+
+    def _ingest(self, conn: sqlite3.Connection, name: str, mtime: float, size: int, records: List[Dict]):
+        summary = summarize_records(records)
+        conn.execute("DELETE FROM events WHERE name = ?", (name,))
+        conn.execute(
+            f"INSERT INTO events (name, venue, mtime, size, {', '.join(SUMMARY_COLUMNS)}) "
+            f"VALUES (?, ?, ?, ?, {', '.join('?' * len(SUMMARY_COLUMNS))})",
+            (name, venue_of(name), mtime, size, *(_nullable(summary[column]) for column in SUMMARY_COLUMNS))
+        )
+        conn.executemany(
+            f"INSERT INTO windows (event, {', '.join(WINDOW_COLUMNS)}) "
+            f"VALUES (?, {', '.join('?' * len(WINDOW_COLUMNS))})",
+            [(name, *(record.get(column) for column in WINDOW_COLUMNS)) for record in records]
+        )
+
+    def version(self) -> tuple:
+        """Changes whenever an event is added, re-ingested or removed; for keying cached query results."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT COUNT(*), MAX(mtime), SUM(size) FROM events").fetchone()
+            return tuple(row)
+
+    def events(self) -> List[Dict]:
+        """Summaries of all indexed events, ordered by name."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT name, venue, {', '.join(SUMMARY_COLUMNS)} FROM events ORDER BY name")
+            return [
+                {key: float('nan') if value is None else value for key, value in dict(row).items()}
+                for row in rows
+            ]
+
+    def windows(self, event: str) -> List[Dict]:
+        """Per-window rows of one event, in time order."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(WINDOW_COLUMNS)} FROM windows WHERE event = ? ORDER BY time_taken", (event,)
+            )
+            return [dict(row) for row in rows]
+
+    def aggregate(self, by: Sequence[str], metric: str = 'engagement_score',
+                  events: Optional[str] = None, bucket_seconds: float = 60.0) -> List[Dict]:
+        """Group the windows of all (or the ``events`` glob-matching) events and summarise ``metric``.
+
+        ``by`` picks dimensions from ``GROUP_BY``: event, venue, action and
+        the ``bucket_seconds`` wide time bucket. Each row holds the group
+        keys plus the window count and the mean, min and max of the metric.
+        """
+        unknown = [dimension for dimension in by if dimension not in GROUP_BY]
+        if unknown or metric not in METRIC_COLUMNS:
+            raise ValueError(f"Unknown dimension or metric: {unknown or metric}.")
+        if 'bucket' in by and bucket_seconds <= 0:
+            raise ValueError("bucket_seconds must be positive.")
+
+        columns = [f"{GROUP_BY[dimension]} AS {dimension}" for dimension in by] + [
+            f"COUNT(w.{metric}) AS windows", f"AVG(w.{metric}) AS mean",
+            f"MIN(w.{metric}) AS min", f"MAX(w.{metric}) AS max",
+        ]
+        sql = f"SELECT {', '.join(columns)} FROM windows w JOIN events e ON e.name = w.event"
+        if events:
+            sql += " WHERE e.name GLOB :events"
+        if by:
+            sql += f" GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}"
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, {'events': events, 'bucket_seconds': bucket_seconds})
+            return [dict(row) for row in rows]
+
+    def metric_values(self, metric: str, by: str = 'venue', events: Optional[str] = None) -> List[Dict]:
+        """Every window's ``metric`` with one grouping dimension, e.g. for distribution plots."""
+        if by not in GROUP_BY or by == 'bucket' or metric not in METRIC_COLUMNS:
+            raise ValueError(f"Unknown dimension or metric: {by}, {metric}.")
+        conditions = [f"w.{metric} IS NOT NULL"] + (["e.name GLOB :events"] if events else [])
+        sql = (
+            f"SELECT {GROUP_BY[by]} AS {by}, w.{metric} AS {metric} "
+            f"FROM windows w JOIN events e ON e.name = w.event WHERE {' AND '.join(conditions)}"
+        )
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, {'events': events})]
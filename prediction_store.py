@@ -0,0 +1,66 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from engagement_metrics import TimelineMatrix
+
+STORE_SUFFIX = ".npz"
+
+
+def probability_matrix(timeline: List[Dict]) -> Dict[str, np.ndarray]:
+    """Stack the full probability vectors of a timeline into ``times`` and ``probabilities`` arrays.
+
+    Windows without a prediction or without a kept probability vector are
+    dropped, the same way ``TimelineMatrix`` drops them.
+    """
+    rows = [entry for entry in timeline if entry['i3d_actions'] and entry.get('probabilities') is not None]
+    if not rows:
+        return {
+            'times': np.zeros(0, dtype=np.float64),
+            'motion': np.zeros(0, dtype=np.float32),
+            'probabilities': np.zeros((0, 0), dtype=np.float16),
+        }
+    return {
+        'times': np.asarray([entry['time_taken'] for entry in rows], dtype=np.float64),
+        'motion': np.asarray([np.nan if entry.get('motion') is None else entry['motion'] for entry in rows],
+                             dtype=np.float32),
+        'probabilities': np.stack([entry['probabilities'] for entry in rows]).astype(np.float16),
+    }
+
+
+def save_probability_store(path, timeline: List[Dict], labels: Sequence[str]) -> Optional[Path]:
+    """Write the timeline's probability vectors as a compressed float16 ``.npz``.
+
+    Returns the written path, or None if no entry kept its probabilities.
+    """
+    matrix = probability_matrix(timeline)
+    if not len(matrix['times']):
+        return None
+    path = Path(path).with_suffix(STORE_SUFFIX)
+    np.savez_compressed(
+        path,
+        times=matrix['times'],
+        motion=matrix['motion'],
+        probabilities=matrix['probabilities'],
+        labels=np.asarray(labels, dtype=str),
+    )
+    return path
+
+
+def load_probability_store(path) -> Dict[str, np.ndarray]:
+    """Load ``times``, ``motion``, ``probabilities`` and ``labels`` written by ``save_probability_store``."""
+    with np.load(Path(path).with_suffix(STORE_SUFFIX)) as store:
+        return {
+            'times': store['times'],
+            'motion': store['motion'] if 'motion' in store else np.full(len(store['times']), np.nan),
+            'probabilities': store['probabilities'],
+            'labels': store['labels'].tolist(),
+        }
+
+
+def load_timeline_matrix(path, top_k: Optional[int] = None) -> TimelineMatrix:
+    """Load a probability store as a ``TimelineMatrix`` for ``compute_metrics``."""
+    store = load_probability_store(path)
+    return TimelineMatrix.from_probabilities(store['times'], store['probabilities'], store['labels'], top_k,
+                                           store['motion'])
@@ -0,0 +1,225 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import tensorflow as tf
+
+from inference_backends import MODEL_VARIANTS, QUANTIZED_VARIANTS, convert_to_tflite, resolve_model_variant
+from video_analysis import VIDEO_EXTENSIONS
+
+
+def _configure_int8(converter):
+    # Dynamic-range quantization: int8 weights, float activations
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+
+def _configure_float16(converter):
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+
+
+_CONFIGURE = {
+    "int8": _configure_int8,
+    "float16": _configure_float16,
+}
+
+
+def quantize(model_dir: str, variants: Sequence[str] = tuple(QUANTIZED_VARIANTS),
+             tags: Optional[Sequence[str]] = None, input_shape=(1, 32, 224, 224, 3)) -> Dict[str, str]:
+    """Write the quantized TFLite variants of the SavedModel next to it."""
+    written = {}
+    for variant in variants:
+        _, output_path = resolve_model_variant(model_dir, variant)
+        start = time.perf_counter()
+        convert_to_tflite(model_dir, output_path, tags, input_shape, configure=_CONFIGURE[variant])
+        size_mb = os.path.getsize(output_path) / 2 ** 20
+        print(f"{variant}: wrote {output_path} ({size_mb:.1f} MB) in {time.perf_counter() - start:.1f}s")
+        written[variant] = output_path
+    return written
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process in MB; NaN where ``resource`` is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def find_benchmark_videos(predictions_dir: str, videos_dir: str) -> List[Tuple[str, str]]:
+    """Pair each saved prediction file with the video it was made from (same file stem)."""
+    videos = {
+        path.stem: str(path)
+        for path in Path(videos_dir).iterdir()
+        if path.suffix.lower() in VIDEO_EXTENSIONS
+    }
+    return [
+        (path.stem, videos[path.stem])
+        for path in sorted(Path(predictions_dir).glob('*.json'))
+        if path.stem in videos
+    ]
+
+
+def _replay_variant(variant: str, videos: List[Tuple[str, str]], model_dir: str,
+                    label_map_path: str, settings: Dict) -> Dict:
+    """Analyse every video with one model variant; runs in its own process for a clean peak RSS."""
+    import cv2
+
+    from action_predictor import ActionPredictor
+    from inference_pipeline import InferencePipeline
+
+    backend, model_path = resolve_model_variant(model_dir, variant)
+    predictor = ActionPredictor(model_path, label_map_path, batch_size=settings['batch_size'], backend=backend)
+
+    # Time only the model calls, not decoding
+    inference_seconds = 0.0
+    predict_i3d_clips = predictor.predict_i3d_clips
+
+    def timed_predict(clips, **kwargs):
+        nonlocal inference_seconds
+        start = time.perf_counter()
+        try:
+            return predict_i3d_clips(clips, **kwargs)
+        finally:
+            inference_seconds += time.perf_counter() - start
+
+    predictor.predict_i3d_clips = timed_predict
+
+    timelines = {}
+    for name, video_path in videos:
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        for _ in range(settings['warmup_frames']):
+            cap.grab()
+        pipeline = InferencePipeline(
+            predictor, cap, fps, settings['frame_size'], settings['max_frames'],
+            settings['prediction_interval'], sample_fps=settings['sample_fps'],
+            start_frame=settings['warmup_frames']
+        )
+        try:
+            timelines[name] = list(pipeline.results())
+        finally:
+            pipeline.stop()
+
+    windows = sum(1 for timeline in timelines.values() for entry in timeline if entry['i3d_actions'])
+    model_bytes = os.path.getsize(model_path) if os.path.isfile(model_path) else sum(
+        path.stat().st_size for path in Path(model_path).rglob('*') if path.is_file()
+    )
+    return {
+        'variant': variant,
+        'timelines': timelines,
+        'windows': windows,
+        'latency_ms_per_clip': 1000 * inference_seconds / windows if windows else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'model_size_mb': model_bytes / 2 ** 20,
+        'load_seconds': predictor.load_stats['load_seconds'],
+    }
+
+
+def compare_timelines(baseline: Dict[str, List[Dict]], candidate: Dict[str, List[Dict]]) -> Dict:
+    """Top-1 label agreement and engagement_score drift of a variant against the baseline."""
+    matches = 0
+    drifts = []
+    for name, baseline_timeline in baseline.items():
+        candidate_by_time = {entry['time_taken']: entry['i3d_actions'] for entry in candidate.get(name, [])}
+        for entry in baseline_timeline:
+            expected = entry['i3d_actions']
+            actual = candidate_by_time.get(entry['time_taken'])
+            if not expected or not actual:
+                continue
+            matches += max(expected, key=expected.get) == max(actual, key=actual.get)
+            # Same engagement_score as the rows written to saved_predictions
+            drifts.append(abs(sum(expected.values()) - sum(actual.values())))
+    return {
+        'compared_windows': len(drifts),
+        'top1_agreement': matches / len(drifts) if drifts else 0.0,
+        'mean_engagement_drift': sum(drifts) / len(drifts) if drifts else 0.0,
+        'max_engagement_drift': max(drifts) if drifts else 0.0,
+    }
+
+
+def benchmark(model_dir: str, label_map_path: str, predictions_dir: str, videos_dir: str,
+              variants: Sequence[str] = MODEL_VARIANTS, settings: Optional[Dict] = None) -> List[Dict]:
+    """Replay the videos behind the saved predictions with each variant and report against fp32."""
+    settings = {
+        'frame_size': (224, 224),
+        'max_frames': 32,
+        'prediction_interval': 1.0,
+        'sample_fps': None,
+        'warmup_frames': 10,
+        'batch_size': 8,
+        **(settings or {}),
+    }
+    videos = find_benchmark_videos(predictions_dir, videos_dir)
+    if not videos:
+        raise FileNotFoundError(f"No videos in {videos_dir} match the files in {predictions_dir}.")
+
+    variants = ["fp32"] + [variant for variant in variants if variant != "fp32"]
+    runs = {}
+    context = multiprocessing.get_context("spawn")
+    for variant in variants:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            runs[variant] = pool.submit(
+                _replay_variant, variant, videos, model_dir, label_map_path, settings
+            ).result()
+
+    report = []
+    for variant in variants:
+        run = runs[variant]
+        row = {key: value for key, value in run.items() if key != 'timelines'}
+        row.update(compare_timelines(runs["fp32"]['timelines'], run['timelines']))
+        report.append(row)
+    return report
+
+
+def print_report(report: List[Dict]):
+    header = f"{'variant':<8} {'ms/clip':>8} {'peak MB':>8} {'model MB':>9} {'top-1 agree':>12} {'mean drift':>11} {'max drift':>10}"
+    print(header)
+    print('-' * len(header))
+    for row in report:
+        print(
+            f"{row['variant']:<8} {row['latency_ms_per_clip']:>8.1f} {row['peak_rss_mb']:>8.0f} "
+            f"{row['model_size_mb']:>9.1f} {row['top1_agreement']:>11.1%} "
+            f"{row['mean_engagement_drift']:>11.4f} {row['max_engagement_drift']:>10.4f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the I3D model and benchmark the variants.")
+    parser.add_argument("--model-dir", default="../model/i3d/")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    quantize_parser = subparsers.add_parser("quantize", help="Write int8 and float16 TFLite variants")
+    quantize_parser.add_argument("--variants", nargs="+", choices=list(QUANTIZED_VARIANTS),
+                                 default=list(QUANTIZED_VARIANTS))
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="Compare variants on the saved prediction clips")
+    benchmark_parser.add_argument("--videos", required=True, help="Directory with the source videos, named like the JSON files")
+    benchmark_parser.add_argument("--predictions", default="saved_predictions")
+    benchmark_parser.add_argument("--label-map", default="../model/i3d/label_map.txt")
+    benchmark_parser.add_argument("--variants", nargs="+", choices=list(MODEL_VARIANTS), default=list(MODEL_VARIANTS))
+    benchmark_parser.add_argument("--output", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    if args.command == "quantize":
+        quantize(args.model_dir, args.variants)
+        return
+
+    report = benchmark(args.model_dir, args.label_map, args.predictions, args.videos, args.variants)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import os
+import tempfile
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from downsampling import downsample
+
+MARGIN = 50
+ROW_HEIGHT = 20
+TABLE_COLUMNS = ("Time (seconds)", "Top Action", "Confidence")
+COLUMN_WIDTHS = (100, 200, 100)
+CHART_HEIGHT = 150
+CHART_POINTS = 400  # Points per embedded chart; longer series are LTTB-downsampled
+
+
+def _draw_chart(c: canvas.Canvas, x0: float, y0: float, width: float, title: str,
+                times: np.ndarray, values: np.ndarray):
+    """Draw a downsampled line chart with its lower-left corner at (x0, y0)."""
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(x0, y0 + CHART_HEIGHT + 8, title)
+    c.rect(x0, y0, width, CHART_HEIGHT)
+    measured = ~np.isnan(values)
+    times, values = downsample(times[measured], values[measured], CHART_POINTS)
+    if len(times) < 2:
+        return
+    t_min, t_max = float(times[0]), float(times[-1])
+    v_min, v_max = float(values.min()), float(values.max())
+    xs = x0 + (times - t_min) / ((t_max - t_min) or 1) * width
+    ys = y0 + (values - v_min) / ((v_max - v_min) or 1) * CHART_HEIGHT
+    path = c.beginPath()
+    path.moveTo(xs[0], ys[0])
+    for x, y in zip(xs[1:], ys[1:]):
+        path.lineTo(x, y)
+    c.drawPath(path, stroke=1, fill=0)
+    c.setFont("Helvetica", 8)
+    c.drawString(x0, y0 - 12, f"{t_min:.0f}s")
+    c.drawRightString(x0 + width, y0 - 12, f"{t_max:.0f}s")
+    c.drawRightString(x0 - 4, y0, f"{v_min:.2f}")
+    c.drawRightString(x0 - 4, y0 + CHART_HEIGHT - 8, f"{v_max:.2f}")
+
+
+def _draw_table_header(c: canvas.Canvas, y: float):
+    c.setFont("Helvetica-Bold", 12)
+    x = MARGIN
+    for column, width in zip(TABLE_COLUMNS, COLUMN_WIDTHS):
+        c.drawString(x, y, column)
+        x += width
+    c.setFont("Helvetica", 12)
+
+
+def write_report(path: Optional[str], star_rating: str, overall_engagement: float,
+                 overall_crowd_density: float, overall_average_movement: float,
+                 times: Sequence[float], top_actions: Sequence[str], confidences: Sequence[float],
+                 charts: Optional[Dict[str, Sequence[float]]] = None) -> str:
+    """Write the analysis report to ``path`` (a new temporary file if None) and return the path.
+
+    The detailed predictions table continues over as many pages as needed.
+    ``charts`` maps a title to a per-window series drawn over ``times``.
+    Cells are formatted from the column arrays in one vectorised pass per
+    column, and the document goes straight to disk instead of a buffer.
+    """
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+    times = np.asarray(times, dtype=np.float64)
+    confidences = np.asarray(confidences, dtype=np.float64)
+    columns = (
+        np.char.mod("%.2f", times) if len(times) else np.asarray([], dtype=str),
+        np.asarray(top_actions, dtype=str),
+        np.char.mod("%.2f", confidences) if len(confidences) else np.asarray([], dtype=str),
+    )
+
+    c = canvas.Canvas(path, pagesize=letter, pageCompression=1)
+    width, height = letter
+
+    # Summary page
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(MARGIN, height - 50, "Crowd Engagement Analysis Report")
+    c.setFont("Helvetica", 12)
+    c.drawString(MARGIN, height - 80, f"Event Star Rating: {star_rating}")
+    c.drawString(MARGIN, height - 110, "Overall Scores:")
+    c.drawString(70, height - 130, f"Engagement Score: {overall_engagement:.2f}")
+    c.drawString(70, height - 150, f"Crowd Density: {overall_crowd_density:.2f}")
+    c.drawString(70, height - 170, f"Average Movement: {overall_average_movement:.2f}")
+
+    # Charts, two per page below the summary
+    y = height - 200
+    for title, values in (charts or {}).items():
+        if y - CHART_HEIGHT - 30 < MARGIN:
+            c.showPage()
+            y = height - MARGIN
+        y -= CHART_HEIGHT + 20
+        _draw_chart(c, MARGIN + 30, y, width - 2 * MARGIN - 30, title, times,
+                    np.asarray(values, dtype=np.float64))
+        y -= 30
+
+    # Detailed predictions table, paginated
+    if y - 3 * ROW_HEIGHT < MARGIN:
+        c.showPage()
+        y = height - MARGIN
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(MARGIN, y - ROW_HEIGHT, "Detailed Predictions:")
+    y -= 2 * ROW_HEIGHT
+    _draw_table_header(c, y)
+    for row in range(len(times)):
+        y -= ROW_HEIGHT
+        if y < MARGIN:
+            c.showPage()
+            y = height - MARGIN
+            _draw_table_header(c, y)
+            y -= ROW_HEIGHT
+        x = MARGIN
+        for column, column_width in zip(columns, COLUMN_WIDTHS):
+            c.drawString(x, y, column[row])
+            x += column_width
+
+    c.showPage()
+    c.save()
+    return path
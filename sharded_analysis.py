@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+
+from action_predictor import ActionPredictor
+from frame_sampler import FrameSampler
+from inference_pipeline import InferencePipeline
+from video_analysis import seek_frame
+
+_action_predictor = None  # Per-process predictor created by the pool initializer
+SMT_THREADS_PER_CORE = 2  # Assumed hardware threads per core when psutil cannot count physical cores
+
+
+def physical_cores() -> int:
+    """Number of physical CPU cores.
+
+    psutil is listed in requirements.txt; if it is missing, or cannot tell,
+    assume two-way SMT and halve the logical core count so TF threads are
+    not oversubscribed.
+    """
+    try:
+        import psutil
+        cores = psutil.cpu_count(logical=False)
+    except ImportError:
+        cores = None
+    return cores or max(1, (os.cpu_count() or 1) // SMT_THREADS_PER_CORE)
+
+
+def plan_shards(first_frame: int, total_frames: int, shard_count: int,
+                overlap: int) -> List[Tuple[int, int, int]]:
+    """Split [first_frame, total_frames) into (decode_start, shard_start, shard_end) ranges.
+
+    Each shard starts decoding ``overlap`` frames early so the window is full
+    when its first prediction fires, exactly as it would be in a serial run.
+    """
+    frames = max(0, total_frames - first_frame)
+    shard_count = max(1, min(shard_count, frames))
+    bounds = [first_frame + frames * i // shard_count for i in range(shard_count + 1)]
+    return [
+        (max(first_frame, start - overlap), start, end)
+        for start, end in zip(bounds[:-1], bounds[1:])
+        if end > start
+    ]
+
+
+def _init_worker(i3d_model_path: str, label_map_path: str, batch_size: int, top_k: int,
+                 backend: str, model_variant: str, threads: int, reuse_threshold: Optional[float]):
+    global _action_predictor
+    import tensorflow as tf
+
+    # Keep the workers from oversubscribing the cores between them
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    _action_predictor = ActionPredictor(
+        i3d_model_path, label_map_path, batch_size=batch_size, top_k=top_k,
+        backend=backend, num_threads=threads, model_variant=model_variant,
+        reuse_threshold=reuse_threshold
+    )
+
+
+def _analyze_shard(video_path: str, fps: float, shard: Tuple[int, int, Optional[int]], settings: Dict) -> List[Dict]:
+    decode_start, shard_start, shard_end = shard
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    try:
+        seek_frame(cap, decode_start)
+    except ValueError:
+        cap.release()
+        raise
+
+    pipeline = InferencePipeline(
+        _action_predictor, cap, fps, settings['frame_size'], settings['max_frames'],
+        settings['prediction_interval'], sample_fps=settings['sample_fps'],
+        start_frame=decode_start, end_frame=shard_end, emit_from_frame=shard_start,
+        keep_probabilities=settings['keep_probabilities'],
+        adaptive_intervals=settings['adaptive_intervals']
+    )
+    try:
+        return list(pipeline.results())
+    finally:
+        pipeline.stop()
+
+
+def analyze_sharded(video_path: str, i3d_model_path: str, label_map_path: str, frame_size,
+                    max_frames: int, prediction_interval: float, sample_fps: Optional[float] = None,
+                    warmup_frames: int = 0, workers: Optional[int] = None,
+                    batch_size: int = 1, top_k: int = 5, backend: str = "tf",
+                    model_variant: str = "fp32", keep_probabilities: bool = False,
+                    reuse_threshold: Optional[float] = None,
+                    adaptive_intervals: Optional[Tuple[float, float]] = None) -> List[Dict]:
+    """Analyse a video in time shards on a process pool and return the merged timeline.
+
+    Every worker process loads its own ``ActionPredictor``. The merged
+    timeline is identical to the one a single ``InferencePipeline`` produces
+    (with ``reuse_threshold`` set, each shard starts from a fresh prediction,
+    and with ``adaptive_intervals`` each shard schedules its own predictions).
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    workers = workers or physical_cores()
+    settings = {
+        'frame_size': frame_size,
+        'max_frames': max_frames,
+        'prediction_interval': prediction_interval,
+        'sample_fps': sample_fps,
+        'keep_probabilities': keep_probabilities,
+        'adaptive_intervals': adaptive_intervals,
+    }
+    overlap = FrameSampler(fps, max_frames, prediction_interval, sample_fps).window_span
+    shards = plan_shards(warmup_frames, total_frames, workers, overlap)
+    if not shards:
+        return []
+    # CAP_PROP_FRAME_COUNT is only an estimate for many files, so the last shard reads to the end
+    decode_start, shard_start, _ = shards[-1]
+    shards[-1] = (decode_start, shard_start, None)
+
+    threads = max(1, physical_cores() // len(shards))
+    timeline = []
+    # TensorFlow is not fork-safe, so workers are spawned
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=context, initializer=_init_worker,
+                             initargs=(i3d_model_path, label_map_path, batch_size, top_k, backend, model_variant, threads,
+                                       reuse_threshold)) as pool:
+        futures = [pool.submit(_analyze_shard, video_path, fps, shard, settings) for shard in shards]
+        for future in futures:
+            timeline.extend(future.result())
+    timeline.sort(key=lambda entry: entry['time_taken'])
+    return timeline
@@ -0,0 +1,32 @@
+import queue
+import threading
+
+DONE = object()  # End-of-stream marker passed between stages
+POLL_TIMEOUT = 0.1  # Seconds between stop checks while waiting on a queue
+
+
+def put_until_stopped(target: queue.Queue, item, stop: threading.Event) -> bool:
+    """Block until the item is queued; return False if ``stop`` was set first."""
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=POLL_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def get_until_done(source: queue.Queue, producer: threading.Thread, stop: threading.Event):
+    """Block until an item arrives; return ``DONE`` on stop, or once the producer is gone and nothing is left."""
+    while True:
+        try:
+            return source.get(timeout=POLL_TIMEOUT)
+        except queue.Empty:
+            if stop.is_set():
+                return DONE
+            if not producer.is_alive():
+                # The producer may have queued its last items right before exiting
+                try:
+                    return source.get_nowait()
+                except queue.Empty:
+                    return DONE
@@ -0,0 +1,109 @@
+import heapq
+from typing import Dict, Optional
+
+from engagement_metrics import overall_score, star_rating, window_metrics
+
+
+class RunningStat:
+    """Running count, mean, min, max, EWMA and median of a stream of values.
+
+    Mean, min, max and EWMA update in O(1); the exact median keeps two heaps
+    and updates in O(log n).
+    """
+
+    def __init__(self, ewma_alpha: float = 0.2):
+        self.ewma_alpha = ewma_alpha
+        self.count = 0
+        self.mean = float('nan')
+        self.min = float('nan')
+        self.max = float('nan')
+        self.ewma = float('nan')
+        self.last = float('nan')
+        self._lower = []  # Max-heap (negated) of the smaller half
+        self._upper = []  # Min-heap of the larger half
+
+    def update(self, value: float):
+        value = float(value)
+        self.count += 1
+        self.last = value
+        if self.count == 1:
+            self.mean = self.min = self.max = self.ewma = value
+        else:
+            self.mean += (value - self.mean) / self.count
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+            self.ewma += self.ewma_alpha * (value - self.ewma)
+
+        if self._lower and value > -self._lower[0]:
+            heapq.heappush(self._upper, value)
+        else:
+            heapq.heappush(self._lower, -value)
+        if len(self._lower) > len(self._upper) + 1:
+            heapq.heappush(self._upper, -heapq.heappop(self._lower))
+        elif len(self._upper) > len(self._lower):
+            heapq.heappush(self._lower, -heapq.heappop(self._upper))
+
+    @property
+    def median(self) -> float:
+        if not self.count:
+            return float('nan')
+        if len(self._lower) > len(self._upper):
+            return -self._lower[0]
+        return (-self._lower[0] + self._upper[0]) / 2
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'median': self.median,
+            'ewma': self.ewma,
+            'min': self.min,
+            'max': self.max,
+            'last': self.last,
+        }
+
+
+class EngagementAggregator:
+    """Engagement metrics accumulated as each prediction lands.
+
+    Live gauges and the final report read the same state, so the overall
+    scores are available, and correct for the windows seen so far, at any
+    point during an analysis.
+    """
+
+    METRICS = ('engagement', 'crowd_density', 'movement', 'engagement_score', 'average_movement')
+
+    def __init__(self, ewma_alpha: float = 0.2):
+        self.stats = {metric: RunningStat(ewma_alpha) for metric in self.METRICS}
+        self.windows = 0
+        self.last_time = None
+
+    def update(self, entry: Dict) -> Optional[Dict[str, float]]:
+        """Add one timeline entry; returns its window metrics, or None if it has no prediction."""
+        self.last_time = entry['time_taken']
+        actions = entry['i3d_actions']
+        if not actions:
+            return None
+        metrics = window_metrics(actions)
+        for metric, stat in self.stats.items():
+            stat.update(metrics[metric])
+        self.windows += 1
+        return metrics
+
+    def overall(self) -> Dict:
+        """Overall scores with the same definitions as ``engagement_metrics.compute_metrics``."""
+        overall_engagement = self.stats['engagement'].mean
+        overall_crowd_density = self.stats['crowd_density'].mean
+        overall_average_movement = self.stats['movement'].mean
+        score = overall_score(overall_engagement, overall_crowd_density, overall_average_movement)
+        return {
+            'windows': self.windows,
+            'overall_engagement': overall_engagement,
+            'overall_crowd_density': overall_crowd_density,
+            'overall_average_movement': overall_average_movement,
+            'overall_score': score,
+            'star_rating': star_rating(score),
+        }
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {metric: stat.summary() for metric, stat in self.stats.items()}
@@ -0,0 +1,120 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from inference_backends import InferenceBackend, TFLiteBackend, check_parity, resolve_model_variant
+
+LABELS = 12
+CLIP_SHAPE = (4, 8, 8, 3)
+TOLERANCE = 1e-3
+
+
+class LinearBackend(InferenceBackend):
+    """Synthetic backend: a fixed linear map of the flattened clip, plus optional output noise."""
+
+    name = "linear"
+
+    def __init__(self, weights: np.ndarray, noise: float = 0.0, top_k: int = 5):
+        super().__init__(top_k)
+        self.weights = weights
+        self.noise = noise
+
+    def logits(self, batch: np.ndarray) -> np.ndarray:
+        logits = batch.reshape(len(batch), -1) @ self.weights
+        if self.noise:
+            logits += np.random.default_rng(1).normal(0, self.noise, logits.shape).astype(np.float32)
+        return logits
+
+
+@pytest.fixture
+def batch():
+    return np.random.default_rng(0).random((6,) + CLIP_SHAPE, dtype=np.float32)
+
+
+@pytest.fixture
+def weights():
+    return np.random.default_rng(2).normal(0, 0.1, (int(np.prod(CLIP_SHAPE)), LABELS)).astype(np.float32)
+
+
+def test_identical_backends_agree(batch, weights):
+    report = check_parity(LinearBackend(weights), LinearBackend(weights.copy()), batch)
+    assert report['max_abs_diff'] == 0
+    assert report['top1_agreement'] == 1.0
+    assert report['topk_overlap'] == 1.0
+
+
+def test_small_numeric_drift_is_within_tolerance(batch, weights):
+    report = check_parity(LinearBackend(weights), LinearBackend(weights, noise=1e-5), batch)
+    assert 0 < report['max_abs_diff'] <= TOLERANCE
+    assert report['top1_agreement'] == 1.0
+
+
+def test_different_model_exceeds_tolerance(batch, weights):
+    other = np.random.default_rng(3).normal(0, 0.1, weights.shape).astype(np.float32)
+    report = check_parity(LinearBackend(weights), LinearBackend(other), batch)
+    assert report['max_abs_diff'] > TOLERANCE
+
+
+def test_backend_without_logits_fails_on_creation():
+    class Incomplete(InferenceBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_tflite_keeps_one_interpreter_per_batch_shape(monkeypatch):
+    created = []
+
+    class FakeInterpreter:
+        def __init__(self, model_path=None, num_threads=None):
+            self.shape = (1,) + CLIP_SHAPE
+            self.allocations = 0
+            created.append(self)
+
+        def get_input_details(self):
+            return [{'index': 0, 'shape': np.array(self.shape)}]
+
+        def get_output_details(self):
+            return [{'index': 1}]
+
+        def resize_tensor_input(self, index, shape):
+            self.shape = tuple(shape)
+
+        def allocate_tensors(self):
+            self.allocations += 1
+
+        def set_tensor(self, index, value):
+            assert value.shape == self.shape
+            self.value = value
+
+        def invoke(self):
+            pass
+
+        def get_tensor(self, index):
+            return np.zeros((len(self.value), LABELS), dtype=np.float32)
+
+    runtime = types.ModuleType("tflite_runtime")
+    runtime.interpreter = types.SimpleNamespace(Interpreter=FakeInterpreter)
+    monkeypatch.setitem(sys.modules, "tflite_runtime", runtime)
+    monkeypatch.setitem(sys.modules, "tflite_runtime.interpreter", runtime.interpreter)
+
+    backend = TFLiteBackend("model.tflite")
+    for size in (1, 3, 1, 3, 8, 3):
+        assert backend.logits(np.zeros((size,) + CLIP_SHAPE, dtype=np.float32)).shape == (size, LABELS)
+    assert len(created) == 3
+    assert all(interpreter.allocations == 1 for interpreter in created)
+
+
+@pytest.mark.parametrize("model_path, backend", [
+    ("model/i3d", "tf"),
+    ("model/i3d/i3d.tflite", "tflite"),
+    ("model/i3d/i3d.onnx", "onnx"),
+])
+def test_quantized_variants_resolve_next_to_the_saved_model(model_path, backend):
+    assert resolve_model_variant(model_path, "int8", backend) == ("tflite", "model/i3d/i3d_int8.tflite")
+    assert resolve_model_variant(model_path, "fp32", backend) == (backend, model_path)
@@ -0,0 +1,102 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+
+from frame_sampler import FrameSampler
+from inference_pipeline import InferencePipeline
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
+
+
+def video_properties(video_source: str) -> Tuple[float, int]:
+    """Frame rate and frame count of a video."""
+    cap = cv2.VideoCapture(video_source)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_source}")
+    try:
+        return cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+
+
+def seek_frame(cap: cv2.VideoCapture, frame_index: int):
+    """Position ``cap`` so that the next read returns frame ``frame_index``.
+
+    Seeking is approximate for many mp4 and variable frame rate files, so
+    when the reported position is off the video is rewound and grabbed
+    forward instead. Raises ``ValueError`` if the video ends first.
+    """
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_index:
+        return
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(frame_index):
+        if not cap.grab():
+            raise ValueError(f"Video ends before frame {frame_index}")
+
+
+def video_duration(video_source: str) -> float:
+    """Duration of a video in seconds, from its frame count and frame rate."""
+    fps, total_frames = video_properties(video_source)
+    return float(total_frames / fps)
+
+
+def analyze_video(action_predictor, video_source: str, frame_size, max_frames: int,
+                  prediction_interval: float, sample_fps: Optional[float] = None,
+                  warmup_frames: int = 0, max_seconds: Optional[float] = None,
+                  preprocess_workers: int = 2, queue_size: int = 64, keep_probabilities: bool = False,
+                  adaptive_intervals: Optional[Tuple[float, float]] = None,
+                  on_entry: Optional[Callable[[Dict], None]] = None,
+                  resume_from_frame: Optional[int] = None) -> Tuple[List[Dict], float]:
+    """Run the I3D timeline for one video; returns ``(timeline, video_duration)``.
+
+    ``on_entry`` is called with each timeline entry as soon as it is
+    predicted. With ``resume_from_frame`` only predictions from that frame
+    on are made, decoding just enough earlier frames to fill the first
+    window, e.g. to continue a checkpointed analysis. Raises ``IOError`` if
+    the video cannot be opened and ``ValueError`` if it is shorter than the
+    warm-up.
+    """
+    cap = cv2.VideoCapture(video_source)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_source}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    duration = float(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) / fps)
+
+    # Warm-up phase
+    for _ in range(warmup_frames):
+        if not cap.grab():
+            cap.release()
+            raise ValueError(f"Video is too short for warm-up: {video_source}")
+
+    start_frame = warmup_frames
+    emit_from_frame = None
+    if resume_from_frame is not None and resume_from_frame > warmup_frames:
+        # Start decoding one window early so the first resumed window is full
+        overlap = FrameSampler(fps, max_frames, prediction_interval, sample_fps).window_span
+        start_frame = max(warmup_frames, resume_from_frame - overlap)
+        emit_from_frame = resume_from_frame
+        try:
+            seek_frame(cap, start_frame)
+        except ValueError:
+            cap.release()
+            raise
+
+    timeline = []
+    pipeline = InferencePipeline(
+        action_predictor, cap, fps, frame_size, max_frames, prediction_interval,
+        sample_fps=sample_fps, start_frame=start_frame, emit_from_frame=emit_from_frame,
+        preprocess_workers=preprocess_workers, queue_size=queue_size,
+        keep_probabilities=keep_probabilities, adaptive_intervals=adaptive_intervals
+    )
+    try:
+        for entry in pipeline.results():
+            if max_seconds is not None and entry['time_taken'] >= max_seconds:
+                break
+            timeline.append(entry)
+            if on_entry is not None:
+                on_entry(entry)
+    finally:
+        pipeline.stop()
+    return timeline, duration